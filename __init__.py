@@ -10,17 +10,22 @@ from .alg.data import \
     PredicateTable
 
 from .alg.model import BaseModel
-from .alg.generator import build_spcr
+from .alg.budget import Budget
+from .alg.generator import build_spcr, iter_spcr
+from .alg.sinks import RuleSink, TextSink, ListSink, RuleSetSink, RuleStoreSink, CallbackSink
 
 # fix-points
 from .alg.structure import Object, FixPoint
 from .alg.fixpoint import fix_points
+from .alg.ruleindex import RuleIndex
 
 # lang
 from .lang.opers import Var
 from .lang.predicate import Predicate
 from .lang.regularity import Regularity
+from .lang.ruleset import RuleSet
 from .lang.parser import decstr, cstr, decstr_folder
 
 # utils
 from .utils.cluster import altair
+from .utils.stats import SearchStats
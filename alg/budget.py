@@ -0,0 +1,79 @@
+from time import time
+from typing import *
+
+
+class Budget:
+    """
+    Limits of the rule search: wall-clock seconds, number of expanded search nodes and of emitted rules.
+    None -- no limit
+    """
+
+    def __init__(self, seconds: float = None, nodes: int = None, rules: int = None) -> None:
+        if seconds is not None and seconds <= 0:
+            raise ValueError('seconds must be float and > 0')
+        if nodes is not None and nodes < 1:
+            raise ValueError('nodes must be int and >= 1')
+        if rules is not None and rules < 1:
+            raise ValueError('rules must be int and >= 1')
+        self.seconds = seconds
+        self.nodes = nodes
+        self.rules = rules
+
+    def start(self, parent: 'BudgetMeter' = None, deadline: float = None) -> 'BudgetMeter':
+        return BudgetMeter(self, parent, deadline)
+
+
+class BudgetMeter:
+    """
+    Spending of the Budget by a running search. Nodes and rules are also counted in the parent meter
+    (e.g. of the whole build_spcr), the search is stopped when any of them is exceeded
+    """
+    __slots__ = ('budget', 'parent', 'deadline', 'nodes', 'rules', 'reason')
+
+    def __init__(self, budget: Budget, parent: 'BudgetMeter' = None, deadline: float = None) -> None:
+        """
+        :param deadline: time.time() to stop at regardless of budget.seconds
+        """
+        self.budget = budget
+        self.parent = parent
+        self.deadline = time() + budget.seconds if budget.seconds is not None else None
+        if deadline is not None:
+            self.deadline = deadline if self.deadline is None else min(self.deadline, deadline)
+        self.nodes = 0
+        self.rules = 0
+        self.reason: Optional[str] = None  # исчерпанный лимит: 'seconds', 'nodes' или 'rules'
+
+    def node(self, count: int = 1) -> None:
+        self.nodes += count
+        if self.parent is not None:
+            self.parent.node(count)
+
+    def take(self, rules: List) -> List:
+        """
+        Counts the rules to be emitted: the ones within the rules limit (if some are dropped, the search is exceeded)
+        """
+        allowed = len(rules)
+        if self.budget.rules is not None:
+            allowed = min(allowed, self.budget.rules - self.rules)
+        if self.parent is not None:
+            allowed = len(self.parent.take(rules[:allowed]))
+        self.rules += allowed
+        if allowed == len(rules):
+            return rules
+        self.reason = self.reason or 'rules'
+        return rules[:allowed]
+
+    def exceeded(self) -> Optional[str]:
+        """
+        :return: reason why the search must be stopped or None
+        """
+        if self.reason is None:
+            if self.deadline is not None and time() >= self.deadline:
+                self.reason = 'seconds'
+            elif self.budget.nodes is not None and self.nodes >= self.budget.nodes:
+                self.reason = 'nodes'
+            elif self.budget.rules is not None and self.rules >= self.budget.rules:
+                self.reason = 'rules'
+            elif self.parent is not None:
+                self.reason = self.parent.exceeded()
+        return self.reason
@@ -0,0 +1,79 @@
+import os
+import pickle
+from time import monotonic
+from typing import *
+
+from ..lang.predicate import Predicate
+from ..lang.regularity import Regularity
+
+# узел поиска на стеке: (правило, маска разрешенных предикатов PredicateTable.used, глубина,
+#                       номер следующего кандидата на расширение, было ли найдено расширение)
+FrameState = Tuple[Regularity, int, int, int, bool]
+
+
+class SearchCheckpoint:
+    """
+    Periodically saved state of build_spcr: output directory, list of conclusions, number of finished
+    conclusions and, if the search of the next conclusion is in progress, size of its output and
+    the stack of the search. The file is replaced atomically, so a crash while saving keeps the previous state
+    """
+
+    def __init__(self,
+                 filename: Optional[str],
+                 interval: float,
+                 path: str,
+                 conclusions: List[Predicate]) -> None:
+        """
+        :param filename: checkpoint file, None -- do not save anything
+        :param interval: minimal time between savings in maybe_save, seconds
+        """
+        self.filename = filename
+        self.interval = interval
+        self.path = path
+        self.conclusions = list(conclusions)
+        self.done = 0
+        self.offset: Optional[int] = None
+        self.stack: Optional[List[FrameState]] = None
+        self.__last = monotonic()
+
+    @staticmethod
+    def load(filename: str, interval: float, conclusions: List[Predicate]) -> 'SearchCheckpoint':
+        with open(filename, 'rb') as f:
+            state = pickle.load(f)
+
+        if state['conclusions'] != list(conclusions):
+            raise ValueError('checkpoint was saved for another list of conclusions')
+
+        checkpoint = SearchCheckpoint(filename, interval, state['path'], conclusions)
+        checkpoint.done, checkpoint.offset, checkpoint.stack = state['done'], state['offset'], state['stack']
+        return checkpoint
+
+    def maybe_save(self, done: int, sink=None, stack: List = None) -> None:
+        if self.filename is not None and monotonic() - self.__last >= self.interval:
+            self.save(done, sink, stack)
+
+    def save(self, done: int, sink=None, stack: List = None) -> None:
+        """
+        :param done: number of finished conclusions
+        :param sink: RuleSink receiving the rules of the current conclusion, its output is made durable first
+        :param stack: frames of the current conclusion search (objects with method state() -> FrameState)
+        """
+        if self.filename is None:
+            return
+
+        offset = sink.position() if stack else None
+
+        state = {
+            'path': self.path,
+            'conclusions': self.conclusions,
+            'done': done,
+            'offset': offset,
+            'stack': [frame.state() for frame in stack] if stack else None,
+        }
+        tmp = self.filename + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.filename)
+        self.__last = monotonic()
@@ -1,6 +1,6 @@
 import json
+from contextlib import contextmanager
 from copy import copy
-from copy import deepcopy
 from dataclasses import dataclass, asdict
 from typing import *
 
@@ -10,6 +10,9 @@ import pandas as pd
 from ..lang.opers import Eq, Neq, Var
 from ..lang.predicate import Predicate
 from ..lang.regularity import Regularity
+from ..utils.bitset import full, intersect, pack
+from ..utils.fisher import log_factorial_table
+from ..utils.shared import SharedArrays
 
 """
 
@@ -245,34 +248,38 @@ class PredicateEncoder:
                   ) -> Union[pd.DataFrame, pd.Series, Predicate, Any]:
 
         if isinstance(obj, pd.DataFrame):
-            transformed_obj = obj.copy(deep=True)
-
-            # Replace cat_features
-            if (cf := self.encoding.get('cat_features')) is not None:
-                for column, to_replace_dict in cf.items():
-                    transformed_obj.iloc[:, column] = obj.iloc[:, column].map(to_replace_dict).astype('Int64')
-
-            # Replace bool_features
-            if (bf := self.encoding.get('bool_features')) is not None:
-                for column, to_replace_dict in bf.items():
-                    transformed_obj.iloc[:, column] = obj.iloc[:, column].map(to_replace_dict).astype('boolean')
+            codes, categories = self.encode(obj)
+            columns = {}
+            for j in range(obj.shape[1]):
+                if j in codes:
+                    missing = codes[j] < 0
+                    if Var.isbin(self.__encoded_type(j)):
+                        values = np.append(categories[j].astype(bool), False)[codes[j]]
+                        columns[j] = pd.arrays.BooleanArray(values, missing)
+                    else:
+                        values = np.append(categories[j].astype(np.int64), 0)[codes[j]]
+                        columns[j] = pd.arrays.IntegerArray(values, missing)
+                else:
+                    columns[j] = obj.iloc[:, j].array
 
+            transformed_obj = pd.DataFrame(columns, index=obj.index)
+            transformed_obj.columns = obj.columns
             return transformed_obj
 
         elif isinstance(obj, pd.Series):
             pass  # TODO
         elif isinstance(obj, Predicate):
             if Var.iscat(obj.vtype):
-                tmp_op = copy(obj.operation)
-                tmp_op.params = self.encoding['cat_features'][self.cd.features[obj.name]][obj.operation.params]
+                params = self.encoding['cat_features'][self.cd.features[obj.name]][obj.operation.params]
+                tmp_op = type(obj.operation)(params)
                 transformed_pr = Predicate(
                     name=self.cd.features[obj.name],
                     vtype=obj.vtype,
                     operation=tmp_op)
 
             elif Var.isbin(obj.vtype):
-                tmp_op = copy(obj.operation)
-                tmp_op.params = self.encoding['bool_features'][self.cd.features[obj.name]][obj.operation.params]
+                params = self.encoding['bool_features'][self.cd.features[obj.name]][obj.operation.params]
+                tmp_op = type(obj.operation)(params)
                 transformed_pr = Predicate(
                     name=self.cd.features[obj.name],
                     vtype=obj.vtype,
@@ -304,6 +311,30 @@ class PredicateEncoder:
         else:
             raise TypeError(f'{type(obj)} type is untransformable')
 
+    def encode(self, df: pd.DataFrame) -> Tuple[Dict[int, np.ndarray], Dict[int, np.ndarray]]:
+        """
+        Кодирует категориальные и бинарные признаки без копирования DataFrame:
+        для каждого признака возвращает массив кодов (-1 -- пропуск или значение вне кодировки)
+        и массив закодированных значений, т.е. transform(df)[column] == categories[column][codes[column]]
+
+        :param df: pd.DataFrame with sample
+        :returns: codes, categories
+        """
+        codes, categories = {}, {}
+        for feature_type in ('cat_features', 'bool_features'):
+            if (fe := self.encoding.get(feature_type)) is not None:
+                for column, to_replace_dict in fe.items():
+                    codes[column] = pd.Categorical(df.iloc[:, column], categories=list(to_replace_dict)).codes
+                    categories[column] = np.array(list(to_replace_dict.values()), dtype=object)
+
+        return codes, categories
+
+    def __encoded_type(self, column: int) -> Var:
+        if (bf := self.encoding.get('bool_features')) is not None and column in bf:
+            return Var.Bool
+        else:
+            return Var.Cat
+
     def inverse_transform(self, obj: Union[
         pd.DataFrame, pd.Series, Predicate, Any]
                   ) -> Union[pd.DataFrame, pd.Series, Predicate, Any]:
@@ -318,16 +349,16 @@ class PredicateEncoder:
             pass  # TODO
         elif isinstance(obj, Predicate):
             if Var.iscat(obj.vtype):
-                tmp_op = copy(obj.operation)
-                tmp_op.params = self.inv_encoding['cat_features'][obj.name][obj.operation.params]
+                params = self.inv_encoding['cat_features'][obj.name][obj.operation.params]
+                tmp_op = type(obj.operation)(params)
                 transformed_pr = Predicate(
                     name=inv_cd_features[obj.name],
                     vtype=obj.vtype,
                     operation=tmp_op)
 
             elif Var.isbin(obj.vtype):
-                tmp_op = copy(obj.operation)
-                tmp_op.params = self.inv_encoding['bool_features'][obj.name][obj.operation.params]
+                params = self.inv_encoding['bool_features'][obj.name][obj.operation.params]
+                tmp_op = type(obj.operation)(params)
                 transformed_pr = Predicate(
                     name=inv_cd_features[obj.name],
                     vtype=obj.vtype,
@@ -371,7 +402,10 @@ class PredicateTable:
     cd: ColumnsDescription = None
     pe: PredicateEncoder = None
     table: Dict[int, List[Tuple[Predicate, Predicate]]] = None  # TODO REFORMAT
-    used_predicate: Dict[int, List[List[bool]]] = None
+    predicates: List[Predicate] = None  # fixed ordering: features as in table, (pos, neg) of every pair
+    index: Dict[Predicate, int] = None  # predicate -> its position in predicates
+    used: int = None  # bitmask of allowed predicates, bit i <-> predicates[i]
+    feature_bits: Dict[int, int] = None  # feature -> bitmask of its predicates
 
     def __init__(self,
                  pe: PredicateEncoder = None,
@@ -380,55 +414,87 @@ class PredicateTable:
         self.pe = pe
         self.df = df
         self.cd = cd
+        self.__init_keep = None  # position -> mask without the pair of predicate
+        self.__drop_keep = None  # position -> mask without the lexicographic prefix through predicate
 
     def __iter__(self) -> Iterator:
-        for k, v in self.table.items():
-            for k_used in range(len(v_used := self.used_predicate[k])):
-                if v_used[k_used][0]:
-                    yield self.table[k][k_used][0]
-                if v_used[k_used][1]:
-                    yield self.table[k][k_used][1]
+        used = self.used
+        while used:
+            low = used & -used
+            yield self.predicates[low.bit_length() - 1]
+            used ^= low
 
     def init(self, p: Predicate) -> 'PredicateTable':
         if self.table is None:
             raise AttributeError("Generate PT first")
 
-        new_pe = PredicateTable()
-        new_pe.table = self.table
-        new_pe.used_predicate = deepcopy(self.used_predicate)
-
-        for k in range(len(lp := new_pe.table[p.name])):
-            if p == lp[k][0] or p == lp[k][1]:
-                new_pe.used_predicate[p.name][k][0] = False
-                new_pe.used_predicate[p.name][k][1] = False
-
-        return new_pe
+        if (i := self.index.get(p)) is None:
+            # значения заключения нет в таблице -- запрещать нечего
+            return self.__derive(self.used)
+        return self.__derive(self.used & self.__init_keep[i])
 
     def drop(self, p: Predicate) -> 'PredicateTable':
         """
-        Метод запрещает использование предиката p при
+        Метод запрещает использование предиката p и всех предикатов, лексикографически меньших p
+        (предикаты признаков с меньшим номером и предыдущие пары того же признака)
         """
         if self.table is None:
             raise AttributeError("Generate PT first")
 
-        new_pe = PredicateTable()
-        new_pe.table = self.table
-        new_pe.used_predicate = deepcopy(self.used_predicate)
+        return self.__derive(self.used & self.__drop_keep[self.index[p]])
 
-        new_pe.used_predicate = PredicateTable.__do_lex_drop(new_pe.used_predicate, p)
-        for k in range(len(upr := new_pe.used_predicate[p.name])):
-            upr[k][0] = False
-            upr[k][1] = False
-            if new_pe.table[p.name][k][1] == p or new_pe.table[p.name][k][0] == p:
-                break
+    def subtable(self, used: int) -> 'PredicateTable':
+        """
+        Таблица с заданной маской разрешенных предикатов, например, маской таблицы из другого процесса
+        (порядок предикатов определяется кодировкой и совпадает)
+        """
+        if self.table is None:
+            raise AttributeError("Generate PT first")
 
-        return new_pe
+        return self.__derive(used)
 
-    @staticmethod
-    def __do_lex_drop(used_predicate: Dict[int, List[List[bool]]], p: Predicate) -> Dict:
-        for k in range(p.name):
-            used_predicate[k] = list(map(lambda _: [False, False], used_predicate[k]))
-        return used_predicate
+    def __derive(self, used: int) -> 'PredicateTable':
+        # таблица и маски общие, меняется только битовая маска
+        new_pt = copy(self)
+        new_pt.used = used
+        return new_pt
+
+    def __build_layout(self) -> None:
+        """
+        Фиксирует порядок предикатов и предвычисляет маски для init и drop
+        """
+        self.predicates = [pr for pr_pairs in self.table.values() for pr_pair in pr_pairs for pr in pr_pair]
+        self.index = {pr: i for i, pr in enumerate(self.predicates)}
+        self.used = (1 << len(self.predicates)) - 1
+
+        self.feature_bits = feature_bits = {}
+        for i, pr in enumerate(self.predicates):
+            feature_bits[pr.name] = feature_bits.get(pr.name, 0) | 1 << i
+
+        self.__init_keep = [0] * len(self.predicates)
+        self.__drop_keep = [0] * len(self.predicates)
+        for feature, pr_pairs in self.table.items():
+            lower = 0
+            for other, bits in feature_bits.items():
+                if other < feature:
+                    lower |= bits
+
+            for k, pr_pair in enumerate(pr_pairs):
+                pair = 0
+                for pr in pr_pair:
+                    pair |= 1 << self.index[pr]
+                lower |= pair
+                for pr in pr_pair:
+                    self.__init_keep[self.index[pr]] = self.used & ~pair
+                    self.__drop_keep[self.index[pr]] = self.used & ~lower
+
+    @property
+    def used_predicate(self) -> Dict[int, List[List[bool]]]:
+        """
+        Флаги разрешенных предикатов в виде таблицы, оставлено для совместимости
+        """
+        return {k: [[bool(self.used >> self.index[pr] & 1) for pr in pr_pair] for pr_pair in v]
+                for k, v in self.table.items()}
 
     def fit(self) -> None:
 
@@ -473,8 +539,7 @@ class PredicateTable:
         if self.pe.encoding['int_features'] is not None:
             pass  # TODO
 
-        # create a special table for using flags
-        self.used_predicate = {k: [[True, True] for _ in range(len(self.table[k]))] for k in self.table.keys()}
+        self.__build_layout()
 
     def __str__(self):
         return str({k: list(map(lambda x: list(map(str, x)), v))for k, v in self.table.items()})
@@ -488,11 +553,20 @@ class PredicateTable:
 
 
 class Sample:
-    data: List = None
     pt: PredicateTable = None
     pe: PredicateEncoder = None
     cd: ColumnsDescription = None
     shape: Tuple[int, int] = None
+    codes: Dict[int, np.ndarray] = None  # column number -> codes of values (-1 if value is missing)
+    categories: Dict[int, np.ndarray] = None  # column number -> encoded values, categories[f][codes[f]]
+    missing: Dict[int, np.ndarray] = None  # column number -> mask of rows with missing value
+    bits: Dict[Predicate, np.ndarray] = None  # packed rows where predicate is true (value is known)
+    known: Dict[int, np.ndarray] = None  # packed rows where feature value is known
+    matrix: np.ndarray = None  # packed predicates x rows matrix, bits[pr] == matrix[index[pr]]
+    index: Dict[Predicate, int] = None
+    known_matrix: np.ndarray = None  # packed columns x rows matrix, known[j] == known_matrix[j]
+    complete: np.ndarray = None  # packed rows where all PredicateTable features are known
+    log_factorial: np.ndarray = None  # log(i!) for i = 0..shape[0], for fisher_exact_batch
 
     def __init__(self,
                  data: pd.DataFrame,
@@ -523,28 +597,147 @@ class Sample:
         else:
             self.pe = pe
 
-        data = data.copy()
-
         if cd is not None:
             self.cd = cd
         else:
             self.cd = create_cd(data, label, cat_features, floating_features,
                                 int_features, bool_features, cd_output_path)
 
-        self.pt = PredicateTable(self.pe, data)
+        self.pt = PredicateTable(self.pe)
         self.pt.fit()
         self.shape = data.shape
-        self.data = self.pe.transform(data).values.tolist()
+        self.__data = None
+        self.__shared = None
+
+        self.__build_columns(data)
+        self.__build_bitsets()
+        self.log_factorial = log_factorial_table(self.shape[0])
+
+    def __build_columns(self, data: pd.DataFrame) -> None:
+        """
+        Переводит каждый столбец в массив кодов значений минимального целочисленного типа
+        """
+        self.codes, self.categories = self.pe.encode(data)
+        for j in range(self.shape[1]):
+            if j not in self.codes:
+                codes, uniques = pd.factorize(data.iloc[:, j])
+                self.codes[j] = codes
+                self.categories[j] = np.asarray(uniques, dtype=object)
+            self.codes[j] = self.codes[j].astype(code_dtype(len(self.categories[j])), copy=False)
+
+        self.missing = {j: codes < 0 for j, codes in self.codes.items()}
 
-        replace_missing_values(self.data, self.shape)
+    def __build_bitsets(self) -> None:
+        """
+        Строит для каждого предиката из PredicateTable битовую маску строк, на которых он истинен,
+        и для каждого признака -- маску строк с известным значением.
+        Маски хранятся строками матриц matrix (предикаты x строки) и known_matrix (признаки x строки)
+        """
+        self.known_matrix = pack(~np.stack([self.missing[j] for j in range(self.shape[1])]), axis=1)
+        self.known = {j: self.known_matrix[j] for j in range(self.shape[1])}
+
+        predicates = self.pt.predicates
+        self.index = {pr: i for i, pr in enumerate(predicates)}
+        self.matrix = np.stack([self.__eval_bits(pr) for pr in predicates]) if predicates else \
+            np.empty((0, self.known_matrix.shape[1]), dtype=np.uint8)
+        self.bits = {pr: self.matrix[i] for pr, i in self.index.items()}
+
+        # строки, в которых известны значения всех признаков из PredicateTable
+        self.complete = intersect((self.known[j] for j in self.pt.table), full(self.shape[0]))
+
+    def __eval_bits(self, pr: Predicate) -> np.ndarray:
+        # предикат вычисляется на значениях категорий, последний элемент отвечает пропуску (код -1)
+        categories = self.categories[pr.name]
+        truth = np.zeros(len(categories) + 1, dtype=bool)
+        truth[:-1] = np.fromiter(map(pr, categories), dtype=bool, count=len(categories))
+        return pack(truth[self.codes[pr.name]])
+
+    def bits_of(self, pr: Predicate) -> np.ndarray:
+        """
+        Битовая маска строк, на которых предикат истинен. Для предикатов не из PredicateTable
+        маска вычисляется при первом обращении
+        """
+        if (b := self.bits.get(pr)) is None:
+            b = self.bits[pr] = self.__eval_bits(pr)
+        return b
 
+    def raw_bits_of(self, pr: Predicate) -> np.ndarray:
+        """
+        Битовая маска строк, на которых истинен pr[obj] для obj из Sample.data, т.е. на пропусках
+        предикат вычисляется от None (например, x != c на пропуске истинен)
+        """
+        if pr(None):
+            return self.bits_of(pr) | pack(self.missing[pr.name])
+        else:
+            return self.bits_of(pr)
 
-def replace_missing_values(data: List[List],
-                           shape: Tuple[int, int] = None) -> None:
-    for i in range(shape[0]):
-        for j in range(shape[1]):
-            if (el := data[i][j]) is pd.NA or el is np.nan:
-                data[i][j] = None
+    def rows_of(self, predicates: List[Predicate]) -> np.ndarray:
+        """
+        Матрица битовых масок предикатов (предикаты x строки)
+        """
+        if all(pr in self.index for pr in predicates):
+            return self.matrix[[self.index[pr] for pr in predicates]]
+        else:
+            return np.stack([self.bits_of(pr) for pr in predicates])
+
+    @contextmanager
+    def share(self) -> Iterator[SharedArrays]:
+        """
+        Помещает массивы выборки в разделяемую память на время блока `with`: копии выборки,
+        переданные через pickle (например, в процессы-исполнители), подключаются к ней без копирования
+        """
+        arrays = {'matrix': self.matrix, 'known_matrix': self.known_matrix,
+                  'complete': self.complete, 'log_factorial': self.log_factorial}
+        for j in range(self.shape[1]):
+            arrays[f'codes/{j}'] = self.codes[j]
+            arrays[f'missing/{j}'] = self.missing[j]
+
+        with SharedArrays(arrays) as shared:
+            self.__shared = shared
+            try:
+                yield shared
+            finally:
+                self.__shared = None
+
+    def __getstate__(self) -> Dict:
+        state = self.__dict__.copy()
+        # представления строк матриц восстанавливаются при распаковке, построчные данные не передаются
+        state.update(bits=None, known=None, _Sample__data=None)
+        if self.__shared is not None:
+            state.update(matrix=None, known_matrix=None, complete=None, log_factorial=None, codes=None, missing=None)
+        return state
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__dict__.update(state)
+        if (shared := self.__shared) is not None:
+            self.matrix, self.known_matrix = shared['matrix'], shared['known_matrix']
+            self.complete, self.log_factorial = shared['complete'], shared['log_factorial']
+            self.codes = {j: shared[f'codes/{j}'] for j in range(self.shape[1])}
+            self.missing = {j: shared[f'missing/{j}'] for j in range(self.shape[1])}
+
+        self.known = {j: self.known_matrix[j] for j in range(self.shape[1])}
+        self.bits = {pr: self.matrix[i] for pr, i in self.index.items()}
+
+    @property
+    def data(self) -> List[List]:
+        """
+        Построчное представление выборки (пропуски заменены на None).
+        Строится при первом обращении, оставлено для совместимости
+        """
+        if self.__data is None:
+            columns = []
+            for j in range(self.shape[1]):
+                column = np.append(self.categories[j], None)[self.codes[j]]
+                columns.append(column.tolist())
+            self.__data = [list(row) for row in zip(*columns)]
+        return self.__data
+
+
+def code_dtype(n_categories: int) -> np.dtype:
+    """
+    Минимальный знаковый целочисленный тип, вмещающий коды категорий и код пропуска -1
+    """
+    return np.min_scalar_type(-n_categories) if n_categories > 0 else np.dtype(np.int8)
 
 
 def missing_cat_bool_typecast(df: pd.DataFrame, cd: ColumnsDescription) -> pd.DataFrame:
@@ -1,5 +1,5 @@
 from copy import copy
-from math import log as mlog
+from multiprocessing import get_context
 from typing import *
 import yaml
 
@@ -8,13 +8,16 @@ try:
 except ImportError:
     from yaml import Loader, Dumper
 
+from .data import PredicateTable
 from .model import BaseModel
+from .ruleindex import RuleIndex, rule_weight
 from .structure import Object, FixPoint
 from ..lang.predicate import Predicate, UndefinedPredicate
 from ..lang.regularity import Regularity
+from ..utils.sys import check_n_jobs
 
 
-def consistency(lits: Object, rules: List[Regularity], md: BaseModel) -> float:
+def consistency(lits: Object, rules: Union[List[Regularity], RuleIndex], md: BaseModel) -> float:
     """
     Мера объекта
     :param lits: Объект
@@ -22,39 +25,54 @@ def consistency(lits: Object, rules: List[Regularity], md: BaseModel) -> float:
     :param md: Параметры поиска / идеализации
     :return: Мера объекта, положительное число
     """
+    if not isinstance(rules, RuleIndex):
+        rules = RuleIndex(rules, md)
+
     measure = 0
-    for rule in rules:
+    for rule, weight in zip(rules.rules, rules.weights):
         if lits.rule_applicability(rule):
             if rule.conclusion in lits:
-                measure += log_prob(rule, md)
+                measure += weight
             if ~ rule.conclusion in lits:
-                measure -= log_prob(rule, md)
+                measure -= weight
     return measure
 
 
-def consistency_add(lits: Object, lit: Predicate, rules: List[Regularity], md: BaseModel) -> float:
+def consistency_add(lits: Object, lit: Predicate, rules: Union[List[Regularity], RuleIndex], md: BaseModel) -> float:
+    if not isinstance(rules, RuleIndex):
+        rules = RuleIndex(rules, md)
+
     measure = 0
-    for rule in rules:
-        if (lit == rule.conclusion or ~ lit == rule.conclusion) and lits.rule_applicability(rule):
+    # правила с заключением lit или ~lit берутся из индекса в исходном порядке
+    for i in sorted(rules.with_conclusion(lit) + rules.with_conclusion(~ lit)):
+        rule = rules.rules[i]
+        if lits.rule_applicability(rule):
             if rule.conclusion in lits:
-                measure += log_prob(rule, md)
+                measure += rules.weights[i]
             if ~ rule.conclusion in lits:
-                measure -= log_prob(rule, md)
+                measure -= rules.weights[i]
     return measure
 
 
 def step_operator(lits: Object,
-                  rules: List[Regularity],
+                  rules: Union[List[Regularity], RuleIndex],
                   model: BaseModel,
                   alternative_choose: bool,
                   logging: bool) -> Object:
+    """
+    :param rules: rules or RuleIndex built from them (fix_points builds it once for all steps)
+    """
+    index = rules if isinstance(rules, RuleIndex) else RuleIndex(rules, model)
+    # вклады всех правил в меру объекта считаются один раз за шаг, мера соседнего объекта --
+    # пересчетом вкладов только тех правил, на которые влияет добавленный или удаленный предикат
+    state = __ObjectState(lits, index, model)
 
-    spec_delta_add, spec_lit_add = __delta_argmax_add_spec(lits, rules, model)
-    delta_del, lit_del = __delta_argmax_del(lits, rules, model)
+    spec_delta_add, spec_lit_add = __delta_argmax_add_spec(state)
+    delta_del, lit_del = __delta_argmax_del(state)
 
-    consistency_lits = consistency(lits, rules, model)
+    consistency_lits = state.consistency
     if spec_delta_add > 0 and spec_delta_add > delta_del and \
-            consistency_lits < consistency(lits.add(spec_lit_add), rules, model):
+            consistency_lits < state.consistency_add(spec_lit_add):
 
         if logging:
             print(' # ---- STEP COMPLETED ---- # ')
@@ -64,10 +82,10 @@ def step_operator(lits: Object,
         return lits.add(spec_lit_add)
     else:
         if alternative_choose:
-            delta_add, lit_add = __delta_argmax_add(lits, rules, model)
+            delta_add, lit_add = __delta_argmax_add(state)
         if alternative_choose and \
                 delta_add > 0 and delta_add > delta_del and \
-                consistency_lits < consistency(lits.add(lit_add), rules, model):
+                consistency_lits < state.consistency_add(lit_add):
 
             if logging:
                 print(' # ---- STEP COMPLETED ---- # ')
@@ -75,7 +93,7 @@ def step_operator(lits: Object,
                 print(f'ALTERNATIVE: {lit_del} wit DELTA: {delta_del}')
 
             return lits.add(lit_add)
-        elif delta_del > 0 and lit_del in lits and consistency_lits < consistency(lits.delete(lit_del), rules, model):
+        elif delta_del > 0 and lit_del in lits and consistency_lits < state.consistency_delete(lit_del):
 
             if logging:
                 print(' # ---- STEP COMPLETED ---- # ')
@@ -95,74 +113,194 @@ def step_operator(lits: Object,
 
 
 def fix_points(lits: List[Object],
-               rules: List[Regularity],
+               rules: Union[List[Regularity], RuleIndex],
                model: BaseModel,
                write_path: str = None,
                alternative_choose: bool = False,
-               logging: bool = False) -> Union[None, List[Object]]:
+               logging: bool = False,
+               n_jobs: int = 1) -> Union[None, List[Object]]:
+    """
+    :param rules: rules or RuleIndex built from them
+    :param write_path: file to write fix points to as soon as they are found, None -- return them
+    :param n_jobs: number of worker processes (-1 -- all processors) idealizing the objects independently.
+        The rule index and the sample are passed to them once (inherited with fork, the sample through
+        shared memory), fix points are returned / written in the order of lits.
+        The objects of lits are not changed with any n_jobs: the search starts from their completed copies
+    """
+    n_jobs = check_n_jobs(n_jobs)
+
+    if not isinstance(rules, RuleIndex):
+        rules = RuleIndex(rules, model)
+
     if write_path is None:
-        return __find_fix_points_and_return(lits, rules, model, alternative_choose, logging)
+        return __find_fix_points_and_return(lits, rules, model, alternative_choose, logging, n_jobs)
     else:
-        __find_fix_points_on_air(lits, rules, model, write_path, alternative_choose)
+        __find_fix_points_on_air(lits, rules, model, write_path, alternative_choose, n_jobs)
 
 
 def __find_fix_points_and_return(lits: List[Object],
-                                 rules: List[Regularity],
+                                 rules: RuleIndex,
                                  model: BaseModel,
                                  alternative_choose: bool = False,
-                                 logging: bool = False) -> List[Object]:
-    fix_points = []
-
-    for lit_now in lits:
-        lit_now.completion(model.sample.pt)
-
-        if logging:
-            print('# ==== STARTING IDEALIZING A NEW OBJECT ==== #')
-
-        while True:
-            lit_next = step_operator(lit_now, rules, model, alternative_choose, logging)
-            if lit_now == lit_next:
-                break
-            lit_now = lit_next
-
-        fix_points.append(lit_now)
-
-    return fix_points
+                                 logging: bool = False,
+                                 n_jobs: int = 1) -> List[Object]:
+    return list(__iter_fix_points(lits, rules, model, alternative_choose, logging, n_jobs))
 
 
 def __find_fix_points_on_air(lits: List[Object],
-                             rules: List[Regularity],
+                             rules: RuleIndex,
                              model: BaseModel,
                              write_path: str = None,
-                             alternative_choose: bool = False) -> None:
+                             alternative_choose: bool = False,
+                             n_jobs: int = 1) -> None:
     with open(write_path, 'w') as f:
+        for lit_now in __iter_fix_points(lits, rules, model, alternative_choose, False, n_jobs):
+            print(yaml.dump([lit_now.to_dict()], Dumper=Dumper), file=f)
+
+
+def __iter_fix_points(lits: List[Object],
+                      rules: RuleIndex,
+                      model: BaseModel,
+                      alternative_choose: bool,
+                      logging: bool,
+                      n_jobs: int) -> Iterator[Object]:
+    if n_jobs == 1 or len(lits) < 2:
         for lit_now in lits:
-            lit_now.completion(model.sample.pt)
+            yield __find_fix_point(lit_now, rules, model, alternative_choose, logging)
+        return
 
-            while True:
-                lit_next = step_operator(lit_now, rules, model, alternative_choose, False)
-                if lit_now == lit_next:
-                    break
-                lit_now = lit_next
+    pt = model.sample.pt
+    # маски правил считаются до запуска процессов, чтобы при fork они достались исполнителям готовыми
+    rules.layout(pt)
+    n_jobs = min(n_jobs, len(lits))
+    # объекты передаются без PredicateTable (см. Object.__getstate__) и подключаются к ней при получении
+    with model.sample.share(), get_context().Pool(n_jobs,
+                                                  initializer=__init_worker,
+                                                  initargs=(rules, model, alternative_choose, logging)) as pool:
+        for lit_now in pool.imap(__fix_point_task, lits, chunksize=max(1, len(lits) // (4 * n_jobs))):
+            lit_now.attach(pt)
+            yield lit_now
 
-            print(yaml.dump([lit_now.to_dict()], Dumper=Dumper), file=f)
 
+def __find_fix_point(lit_now: Object,
+                     rules: RuleIndex,
+                     model: BaseModel,
+                     alternative_choose: bool,
+                     logging: bool) -> Object:
+    # дополняется копия: объекты вызывающего не меняются, как и при передаче исполнителям
+    lit_now = copy(lit_now)
+    lit_now.completion(model.sample.pt)
+
+    if logging:
+        print('# ==== STARTING IDEALIZING A NEW OBJECT ==== #')
+
+    while True:
+        lit_next = step_operator(lit_now, rules, model, alternative_choose, logging)
+        if lit_now == lit_next:
+            break
+        lit_now = lit_next
 
-def __delta_argmax_add(lits: Object,
-                       rules: List[Regularity],
-                       model: BaseModel) -> Tuple[float, Predicate]:
+    return lit_now
+
+
+# состояние процесса-исполнителя fix_points, задается при его запуске
+__worker_args: Optional[Tuple[RuleIndex, BaseModel, bool, bool]] = None
+
+
+def __init_worker(rules: RuleIndex, model: BaseModel, alternative_choose: bool, logging: bool) -> None:
+    global __worker_args
+    __worker_args = rules, model, alternative_choose, logging
+
+
+def __fix_point_task(lit_now: Object) -> Object:
+    return __find_fix_point(lit_now, *__worker_args)
+
+
+class __ObjectState:
+    """
+    Contributions of all rules to the consistency of the object, the consistency and
+    the candidates to add; consistencies of the neighbour objects are computed from them
+    """
+
+    def __init__(self, lits: Object, index: RuleIndex, model: BaseModel) -> None:
+        self.lits = lits
+        self.index = index
+        self.model = model
+        # маски правил над предикатами PredicateTable объекта, если он хранится битовыми масками
+        self.layout = index.layout(lits.pt) if lits.pt is not None else None
+
+        self.terms = [0.] * len(index)
+        self.consistency = 0.
+        literals_to_add = []
+        for i, weight in enumerate(index.weights):
+            if (flags := self.__flags(lits, i)) is not None:
+                # сумма накапливается в том же порядке, что и в consistency
+                if flags[0]:
+                    self.consistency += weight
+                    self.terms[i] += weight
+                else:
+                    literals_to_add.append(index.rules[i].conclusion)
+                if flags[1]:
+                    self.consistency -= weight
+                    self.terms[i] -= weight
+        self.literals_to_add = set(literals_to_add)
+
+    def __flags(self, lits: Object, i: int) -> Optional[Tuple[bool, bool]]:
+        """
+        :return: None if rule i is not applicable to lits, else whether lits contains its conclusion and its negation
+        """
+        # маски не описывают предикаты вне PredicateTable: правила с ними проверяются на таких объектах по предикатам
+        if self.layout is not None and not (lits.extra and self.layout[4][i]):
+            premise, foreign, conclusion, negation, _ = self.layout
+            if premise[i] & lits.known & ~ lits.bits or foreign[i] & lits.known:
+                return None
+            return bool(conclusion[i] & lits.bits), bool(negation[i] & lits.bits)
+
+        rule = self.index.rules[i]
+        if not lits.rule_applicability(rule):
+            return None
+        return rule.conclusion in lits, ~ rule.conclusion in lits
+
+    def consistency_add(self, p: Predicate) -> float:
+        # если признака p не было в объекте, меняется применимость всех правил с этим признаком в посылке
+        if self.lits.has_feature(p.name):
+            premise = self.index.with_premise(p)
+        else:
+            premise = self.index.with_feature(p.name)
+        return self.__changed(self.lits.add(p), p, premise)
+
+    def consistency_delete(self, p: Predicate) -> float:
+        return self.__changed(self.lits.delete(p), p, self.index.with_premise(p))
+
+    def __changed(self, new_lits: Object, p: Predicate, premise: List[int]) -> float:
+        # мера объекта new_lits, отличающегося от lits предикатом p
+        index = self.index
+        affected = set(premise)
+        affected.update(index.with_conclusion(p))
+        affected.update(index.with_conclusion(~ p))
+
+        delta = 0.
+        for i in sorted(affected):
+            term = 0.
+            if (flags := self.__flags(new_lits, i)) is not None:
+                if flags[0]:
+                    term += index.weights[i]
+                if flags[1]:
+                    term -= index.weights[i]
+            delta += term - self.terms[i]
+        return self.consistency + delta
+
+
+def __delta_argmax_add(state: __ObjectState) -> Tuple[float, Predicate]:
 
-    literals_to_add = set(
-        rule.conclusion for rule in rules if lits.rule_applicability(rule) and rule.conclusion not in lits
-    )
     argmax = UndefinedPredicate()
     max_delta_consistency = .0
     max_consistency_added = .0
 
-    consistency_lits = consistency(lits, rules, model)
+    consistency_lits = state.consistency
 
-    for literal in literals_to_add:
-        consistency_added = consistency(lits.add(literal), rules, model)
+    for literal in state.literals_to_add:
+        consistency_added = state.consistency_add(literal)
         delta_consistency = consistency_added - consistency_lits
 
         max_delta_consistency = max(delta_consistency, max_delta_consistency)
@@ -170,26 +308,19 @@ def __delta_argmax_add(lits: Object,
         if consistency_added > max_consistency_added:
             argmax = literal
             max_consistency_added = consistency_added
-    #print(consistency(lits.add(argmax), rules, model), consistency(lits, rules, model))
-    #print(max_delta_consistency, argmax)
 
     return max_delta_consistency, argmax
 
 
-def __delta_argmax_add_spec(lits: Object,
-                            rules: List[Regularity],
-                            model: BaseModel) -> Tuple[float, Predicate]:
+def __delta_argmax_add_spec(state: __ObjectState) -> Tuple[float, Predicate]:
 
-    literals_to_add = set(
-        rule.conclusion for rule in rules if lits.rule_applicability(rule) and rule.conclusion not in lits
-    )
+    lits, index, model = state.lits, state.index, state.model
     argmax = UndefinedPredicate()
     max_delta_consistency = .0
-    max_consistency_added = .0
 
-    for literal in literals_to_add:
-        consistency_added = consistency_add(lits.add(literal), literal, rules, model)
-        consistency_lits = consistency_add(lits, literal, rules, model)
+    for literal in state.literals_to_add:
+        consistency_added = consistency_add(lits.add(literal), literal, index, model)
+        consistency_lits = consistency_add(lits, literal, index, model)
         delta_consistency = consistency_added - consistency_lits
         if delta_consistency > max_delta_consistency:
             max_delta_consistency = delta_consistency
@@ -198,18 +329,16 @@ def __delta_argmax_add_spec(lits: Object,
     return max_delta_consistency, argmax
 
 
-def __delta_argmax_del(lits: Object,
-                       rules: List[Regularity],
-                       model: BaseModel) -> Tuple[float, Predicate]:
+def __delta_argmax_del(state: __ObjectState) -> Tuple[float, Predicate]:
 
     argmax = UndefinedPredicate()
     max_delta_consistency = .0
     max_consistency_deleted = .0
 
-    consistency_lits = consistency(lits, rules, model)
+    consistency_lits = state.consistency
 
-    for literal in lits:
-        consistency_deleted = consistency(lits.delete(literal), rules, model)
+    for literal in state.lits:
+        consistency_deleted = state.consistency_delete(literal)
         delta_consistency = consistency_deleted - consistency_lits
 
         max_delta_consistency = max(delta_consistency, max_delta_consistency)
@@ -222,14 +351,17 @@ def __delta_argmax_del(lits: Object,
 
 
 def log_prob(r: Regularity, model: BaseModel) -> float:
-    return -mlog(1 - r.eval_prob(model))
+    return rule_weight(r.prob if r.prob is not None else r.eval_prob(model))
 
 
-def load_yml_fix_points(path: str = None, stream=None) -> List[Object]:
+def load_yml_fix_points(path: str = None, stream=None, pt: PredicateTable = None) -> List[Object]:
+    """
+    :param pt: PredicateTable of the sample, if passed, objects are stored as bitmasks (see Object)
+    """
     if path is not None:
         with open(path, 'r') as f:
-            return [Object.from_dict(obj) for obj in yaml.load(f, Loader=yaml.FullLoader)]
+            return [Object.from_dict(obj, pt) for obj in yaml.load(f, Loader=yaml.FullLoader)]
     elif stream is not None:
-        return [Object.from_dict(obj) for obj in yaml.load(stream, Loader=yaml.FullLoader)]
+        return [Object.from_dict(obj, pt) for obj in yaml.load(stream, Loader=yaml.FullLoader)]
     else:
         raise ValueError('you must pass `path` or `stream`')
@@ -1,80 +1,855 @@
+import heapq
+import os
+from functools import partial
+from itertools import islice
+from multiprocessing import get_context
+from time import perf_counter
+
+import numpy as np
+
+from .budget import Budget, BudgetMeter
+from .checkpoint import FrameState, SearchCheckpoint
 from .model import *
-from ..lang.parser import cstr
-from ..utils.fisher import fisher_exact
-from ..utils.sys import makedir
+from .sinks import RuleSink, TextSink
+from ..utils.fisher import fisher_exact_below
+from ..utils.measure import RowMask, conclusion_mask, extend_mask, free_mask, loo_contingency, premise_mask
+from ..utils.stats import SearchStats
+from ..utils.sys import check_n_jobs, makedir
+
+# задача построения поддерева: (правило, маска разрешенных предикатов PredicateTable.used, глубина)
+SubtreeTask = Tuple[Regularity, int, int]
+# результат поддерева: (дало ли оно правило, найденные правила)
+SubtreeResult = Tuple[bool, List[Regularity]]
+# результат задачи исполнителя: результат поддерева, число раскрытых узлов, причина остановки поиска по бюджету
+#                                и счетчики поиска (None, если они не собираются)
+TaskResult = Tuple[bool, List[Regularity], int, Optional[str], Optional[SearchStats]]
 
 
-def build_spcr(conclusions: List[Predicate], model: BaseModel) -> None:
+def build_spcr(conclusions: List[Predicate],
+               model: BaseModel,
+               n_jobs: int = 1,
+               split_depth: int = 0,
+               checkpoint: str = None,
+               checkpoint_interval: float = 600.,
+               resume: bool = False,
+               sink: RuleSink = None,
+               budget: Budget = None,
+               premise_first: bool = False) -> RuleSink:
     """
 
     :param conclusions: List of conclusions
-    :param model: model
-    :return: None
+    :param model: model; if it is created with stats=True, model.stats collects counters of the search
+    :param n_jobs: number of worker processes (-1 -- all processors), the sample is passed to them
+        through shared memory
+    :param split_depth: with n_jobs > 1 every subtree of the search rooted at this depth is a separate task,
+        free workers take the next task from the common queue. 0 -- a task per conclusion,
+        larger values spread a single huge conclusion over all workers. Output does not depend on it.
+        Ignored with model.strategy == 'beam' (a task per conclusion)
+    :param checkpoint: file to save the search state to every `checkpoint_interval` seconds, None -- do not save.
+        With n_jobs > 1 or model.strategy == 'beam' the state is saved between conclusions only
+    :param resume: continue the search saved in `checkpoint` (rules are written to the same directory);
+        if the file does not exist, the search starts from the beginning
+    :param sink: receiver of found rules, by default TextSink writing files spcr_<conclusion>.txt to model.path
+    :param budget: limits of the whole search; model.budget limits the search of every conclusion.
+        When a limit is exhausted, the rules found so far are kept and the conclusion is closed as truncated
+        (see RuleSink.close), after the global one the remaining conclusions are not searched
+        (and can be resumed from the checkpoint), with premise_first all conclusions are truncated. With n_jobs > 1 the nodes of subtrees are counted
+        when their results are taken, so the search stops between subtrees of `split_depth`
+    :param premise_first: enumerate premises once for all conclusions (see build_premise_first) instead of
+        a search per conclusion. Without budgets the output is the same, rules are written when the whole search
+        is done. All conclusions are searched at once, so time limits of model.budget run simultaneously and
+        the global `budget` is spent by all of them: when it is exhausted every unfinished conclusion is truncated,
+        instead of the conclusions after the current one being skipped. model.stats.conclusions is not filled,
+        the time of the shared search is not divided between conclusions.
+        Runs in one process with model.strategy == 'dfs' and without checkpoints
+    :return: sink
     """
 
-    path = makedir(model.path)
+    n_jobs = __check_jobs(n_jobs, split_depth)
+    if premise_first:
+        __check_premise_first(model, n_jobs, checkpoint)
 
-    # Генерация заключения
-    def build_conclusion() -> None:
-        for lit in conclusions:
-            poss_lits = model.sample.pt.init(lit)
-            with open(f"{path}spcr_{str(lit)}.txt", "w") as f:
-                build_premise(Regularity(lit), poss_lits, 0, f)
+    if resume and checkpoint is not None and os.path.exists(checkpoint):
+        state = SearchCheckpoint.load(checkpoint, checkpoint_interval, conclusions)
+        if sink is None:
+            sink = TextSink(state.path, sync=True)
+    else:
+        if sink is None:
+            sink = TextSink(makedir(model.path), sync=checkpoint is not None)
+        state = SearchCheckpoint(checkpoint, checkpoint_interval, sink.path, conclusions)
 
-    # Наращивание посылки
-    def build_premise(rule: Regularity, iterlits: PredicateTable, depth: int, file) -> bool:
-        if depth < model.fully_depth:
-            enhance = any(list(map(lambda lit: __do_enhance(lit, rule, iterlits, depth, file), iterlits)))
+    if checkpoint is not None and not sink.persistent:
+        raise ValueError(f'checkpoints can not be used with {type(sink).__name__}')
 
-            if not enhance:
-                return __do_check_base(rule, depth, file)
-            else:
-                return True
+    # с несколькими процессами и в поиске лучом состояние сохраняется только между заключениями
+    stack = state.stack if n_jobs == 1 and model.strategy == 'dfs' else None
+
+    def on_step(i: int, frames: List[Frame]) -> None:
+        state.maybe_save(i, sink, frames)
+
+    if premise_first:
+        search = __search_premise_first(conclusions, model, budget)
+    else:
+        search = __search(conclusions, model, n_jobs, split_depth, state.done, stack, on_step, budget)
+
+    done = state.done
+    for i, rules, meter in search:
+        sink.open(conclusions[i], resume_from=state.offset if i == state.done and stack is not None else None)
+        for rule in rules:
+            sink.write(rule)
+        sink.close(truncated=meter.reason if meter is not None else None)
+        done = i + 1
+        state.maybe_save(done)
+
+    state.save(done)
+    return sink
+
+
+def iter_spcr(conclusions: List[Predicate],
+              model: BaseModel,
+              n_jobs: int = 1,
+              split_depth: int = 0,
+              budget: Budget = None,
+              premise_first: bool = False) -> Iterator[Regularity]:
+    """
+    Generator version of build_spcr: yields found rules (conclusion by conclusion, in the same order
+    as build_spcr writes them) instead of writing them. Truncation of conclusions by budgets is not reported
+    """
+    n_jobs = __check_jobs(n_jobs, split_depth)
+    if premise_first:
+        __check_premise_first(model, n_jobs, None)
+        search = __search_premise_first(conclusions, model, budget)
+    else:
+        search = __search(conclusions, model, n_jobs, split_depth, budget=budget)
+    for _, rules, _ in search:
+        yield from rules
+
+
+def __check_jobs(n_jobs: int, split_depth: int) -> int:
+    n_jobs = check_n_jobs(n_jobs)
+    if split_depth < 0:
+        raise ValueError('split_depth must be int and >= 0')
+    return n_jobs
+
+
+def __check_premise_first(model: BaseModel, n_jobs: int, checkpoint: Optional[str]) -> None:
+    if n_jobs != 1:
+        raise ValueError('premise_first search runs in one process, n_jobs must be 1')
+    if checkpoint is not None:
+        raise ValueError('checkpoints can not be used with premise_first search')
+    if model.strategy != 'dfs':
+        raise ValueError("premise_first search requires strategy 'dfs'")
+
+
+def __search(conclusions: List[Predicate],
+             model: BaseModel,
+             n_jobs: int,
+             split_depth: int,
+             start: int = 0,
+             stack: List[FrameState] = None,
+             on_step: Callable[[int, List['Frame']], None] = None,
+             budget: Budget = None) -> Iterator[Tuple[int, Iterator[Regularity], Optional[BudgetMeter]]]:
+    """
+    Searches of conclusions[start:] one by one: (number of the conclusion, generator of its rules,
+    meter of its budget or None if there are no budgets). The generator of every conclusion must be exhausted
+    before taking the next one, then meter.reason tells whether its search was truncated
+
+    :param stack: saved stack of the search of conclusions[start]
+    :param on_step: on_step(number of the conclusion, stack) is called after every step of the search
+    :param budget: limits of the whole search, the conclusions after the one exhausting them are not searched
+    """
+    counts = __cache_counts(model)
+    total = budget.start() if budget is not None else None
+    if model.strategy == 'beam':
+        # поиск лучом не разбивается на поддеревья: задача -- заключение
+        split_depth = 0
+    try:
+        if n_jobs == 1:
+            for i in range(start, len(conclusions)):
+                meter = __start_meter(model, total)
+                yield i, __timed(model, conclusions[i], build_conclusion(
+                    conclusions[i], model,
+                    stack=stack if i == start else None,
+                    on_step=partial(on_step, i) if on_step is not None else None,
+                    meter=meter)), meter
+                if total is not None and total.exceeded():
+                    return
+        else:
+            # верхние уровни деревьев строятся здесь дважды: сначала собираются задачи в порядке обхода,
+            # затем при повторном обходе на их место подставляются результаты -- порядок вывода не меняется
+            rest = conclusions[start:]
+            plans = __plan(rest, model, split_depth)
+            tasks = [task for plan in plans for task in plan]
+            with model.sample.share(), get_context().Pool(min(n_jobs, max(len(tasks), 1)),
+                                                          initializer=__init_worker,
+                                                          initargs=(model, total.deadline if total else None)) as pool:
+                results = pool.imap(__build_subtree_task, tasks)
+                for i, lit, plan in zip(range(start, len(conclusions)), rest, plans):
+                    meter = __start_meter(model, total)
+                    taken = islice(results, len(plan))
+                    yield i, __timed(model, lit, build_conclusion(
+                        lit, model, split=partial(__take_subtree, taken, model.stats, meter), split_depth=split_depth,
+                        meter=meter)), meter
+                    # поддеревья, оставшиеся после остановки поиска по бюджету
+                    for *_, task_stats in taken:
+                        if model.stats is not None:
+                            model.stats.merge(task_stats)
+                    if total is not None and total.exceeded():
+                        return
+    finally:
+        __count_cache(model, counts)
+
+
+def __search_premise_first(conclusions: List[Predicate],
+                           model: BaseModel,
+                           budget: Budget = None) -> Iterator[Tuple[int, Iterator[Regularity], Optional[BudgetMeter]]]:
+    """
+    __search by build_premise_first: the rules of all conclusions are collected and then given conclusion by conclusion
+    """
+    counts = __cache_counts(model)
+    total = budget.start() if budget is not None else None
+    meters = [__start_meter(model, total) for _ in conclusions]
+    rules = [[] for _ in conclusions]
+    try:
+        for i, rule in build_premise_first(conclusions, model, meters):
+            rules[i].append(rule)
+    finally:
+        __count_cache(model, counts)
+
+    for i in range(len(conclusions)):
+        if model.stats is not None:
+            for rule in rules[i]:
+                model.stats.rules[len(rule.premise)] += 1
+        yield i, iter(rules[i]), meters[i]
+        rules[i] = None
+
+
+def __plan(conclusions: List[Predicate], model: BaseModel, split_depth: int) -> List[List[SubtreeTask]]:
+    # верхние уровни деревьев обходятся повторно при сборке результатов, поэтому обход при планировании
+    # не учитывается в статистике: счетчики очищаются на месте, т.к. на них ссылаются обертки мер
+    if model.stats is None:
+        return [plan_subtrees(lit, model, split_depth) for lit in conclusions]
+
+    saved = SearchStats()
+    saved.merge(model.stats)
+    try:
+        return [plan_subtrees(lit, model, split_depth) for lit in conclusions]
+    finally:
+        model.stats.clear()
+        model.stats.merge(saved)
+
+
+def __start_meter(model: BaseModel, total: Optional[BudgetMeter]) -> Optional[BudgetMeter]:
+    # бюджет заключения, его узлы и правила учитываются и в общем бюджете
+    if model.budget is None and total is None:
+        return None
+    return (model.budget or Budget()).start(parent=total)
+
+
+def __cache_counts(model: BaseModel) -> Tuple[int, int]:
+    return (model.cache.hits, model.cache.misses) if model.cache is not None else (0, 0)
+
+
+def __count_cache(model: BaseModel, counts: Tuple[int, int]) -> None:
+    # обращения к кэшу после снимка counts
+    if model.stats is not None:
+        hits, misses = __cache_counts(model)
+        model.stats.cache_hits += hits - counts[0]
+        model.stats.cache_misses += misses - counts[1]
+
+
+def __timed(model: BaseModel, conclusion: Predicate, rules: Iterator[Regularity]) -> Iterator[Regularity]:
+    # время заключения -- от начала до конца его поиска, включая обработку правил получателем;
+    # правила считаются здесь, т.к. при разбиении на задачи верхние уровни дерева обходятся дважды
+    stats = model.stats
+    if stats is None:
+        yield from rules
+        return
+
+    start = perf_counter()
+    try:
+        for rule in rules:
+            stats.rules[len(rule.premise)] += 1
+            yield rule
+    finally:
+        stats.conclusions[str(conclusion)] = stats.conclusions.get(str(conclusion), 0.) + perf_counter() - start
+
+
+# модель процесса-исполнителя build_spcr и время time.time() окончания общего бюджета,
+# задаются при запуске процесса
+__worker_model: BaseModel = None
+__worker_deadline: Optional[float] = None
+
+
+def __init_worker(model: BaseModel, deadline: Optional[float]) -> None:
+    global __worker_model, __worker_deadline
+    __worker_model, __worker_deadline = model, deadline
+
+
+def __build_subtree_task(task: SubtreeTask) -> TaskResult:
+    rule, used, depth = task
+    model = __worker_model
+    # счетчики исполнителя собираются заново для каждой задачи и передаются вместе с ее результатом
+    if model.stats is not None:
+        model.stats.clear()
+    counts = __cache_counts(model)
+    # поддерево ограничено бюджетом заключения и оставшимся временем общего бюджета
+    meter = (model.budget or Budget()).start(deadline=__worker_deadline)
+    enhanced, rules = collect(build_subtree(rule, model.sample.pt.subtable(used), depth, model, meter=meter))
+    __count_cache(model, counts)
+    return enhanced, rules, meter.nodes, meter.reason, model.stats
+
+
+def __take_subtree(results: Iterator[TaskResult], stats: Optional[SearchStats], meter: Optional[BudgetMeter],
+                   rule: Regularity, iterlits: PredicateTable, depth: int) -> SubtreeResult:
+    enhanced, rules, nodes, truncated, task_stats = next(results)
+    if stats is not None:
+        stats.merge(task_stats)
+    if meter is not None:
+        meter.node(nodes)
+        meter.reason = meter.reason or truncated
+    return enhanced, rules
+
+
+def collect(search: Generator[Regularity, None, bool]) -> SubtreeResult:
+    """
+    Runs the search: (its result, all rules it yielded)
+    """
+    rules = []
+    while True:
+        try:
+            rules.append(next(search))
+        except StopIteration as stop:
+            return stop.value, rules
+
+
+def plan_subtrees(conclusion: Predicate, model: BaseModel, split_depth: int) -> List[SubtreeTask]:
+    """
+    Subtrees of the conclusion search rooted at depth `split_depth` in order of the search
+    """
+    tasks = []
+
+    def split(rule: Regularity, iterlits: PredicateTable, depth: int) -> SubtreeResult:
+        tasks.append((rule, iterlits.used, depth))
+        return False, []
+
+    # обход верхних уровней не зависит от результатов поддеревьев, найденные на них правила не нужны
+    collect(build_conclusion(conclusion, model, split, split_depth))
+    return tasks
+
+
+def build_conclusion(conclusion: Predicate,
+                     model: BaseModel,
+                     split: Callable[[Regularity, PredicateTable, int], SubtreeResult] = None,
+                     split_depth: int = None,
+                     stack: List[FrameState] = None,
+                     on_step: Callable[[List['Frame']], None] = None,
+                     meter: BudgetMeter = None) -> Generator[Regularity, None, bool]:
+    """
+    Search of all rules with the conclusion, see build_subtree
+    """
+    return build_subtree(Regularity(conclusion), model.sample.pt.init(conclusion), 0, model,
+                         split, split_depth, stack, on_step, meter)
+
+
+class Frame:
+    """
+    Node of the premise search on the explicit stack: the rule, its allowed predicates and premise row mask,
+    candidates to enhance the premise with their measures, number of the next candidate and
+    whether any enhancement gave a rule
+    """
+    __slots__ = ('rule', 'iterlits', 'depth', 'mask', 'candidates', 'measured', 'next', 'enhance')
+
+    def __init__(self,
+                 rule: Regularity,
+                 iterlits: PredicateTable,
+                 depth: int,
+                 mask: Optional[RowMask],
+                 candidates: List[Predicate],
+                 measured: List[Optional[Tuple[float, float]]]) -> None:
+        self.rule = rule
+        self.iterlits = iterlits
+        self.depth = depth
+        self.mask = mask
+        self.candidates = candidates
+        self.measured = measured
+        self.next = 0
+        self.enhance = False
+
+    def state(self) -> FrameState:
+        # маска строк, кандидаты и их меры восстанавливаются по правилу и маске предикатов
+        return self.rule, self.iterlits.used, self.depth, self.next, self.enhance
+
+
+class SharedFrame:
+    """
+    Node of the premise-first search: the premise (its allowed predicates and free row mask), its rules with
+    the conclusions whose searches reach the node, candidates to enhance the premise, which of them are
+    allowed for every searched conclusion and their measures, number of the next candidate and
+    whether any enhancement gave a rule for every conclusion
+    """
+    __slots__ = ('iterlits', 'depth', 'mask', 'rules', 'searched', 'candidates', 'allowed', 'probs', 'pvalues',
+                 'next', 'enhance')
+
+    def __init__(self,
+                 iterlits: PredicateTable,
+                 depth: int,
+                 mask: Optional[RowMask],
+                 rules: Dict[int, Regularity],
+                 searched: List[int],
+                 candidates: List[Predicate],
+                 allowed: np.ndarray,
+                 probs: Optional[List[List[float]]],
+                 pvalues: Optional[List[List[float]]]) -> None:
+        self.iterlits = iterlits
+        self.depth = depth
+        self.mask = mask
+        self.rules = rules
+        self.searched = searched
+        self.candidates = candidates
+        self.allowed = allowed
+        self.probs = probs
+        self.pvalues = pvalues
+        self.next = 0
+        self.enhance: Dict[int, bool] = {}
+
+
+def build_premise_first(conclusions: List[Predicate],
+                        model: BaseModel,
+                        meters: List[Optional[BudgetMeter]] = None) -> Iterator[Tuple[int, Regularity]]:
+    """
+    Searches of all conclusions at once. Premises are enumerated by a single depth-first search, its node is
+    shared by all conclusions whose own searches (build_conclusion) reach the premise, and the enhancements
+    of the premise are measured for all of them in one vectorized step (model.shared_measure).
+    Every conclusion gets the same rules in the same order as from build_conclusion
+
+    :param meters: budget meter of every conclusion or None, the conclusion leaves the search when it is exceeded
+    :return: pairs (number of the conclusion, found rule)
+    """
+    sample, pt = model.sample, model.sample.pt
+    use_masks = model.mask_measure is not None
+    stats = model.stats
+    proba, fisher = __checks(model)
+    if meters is None:
+        meters = [None] * len(conclusions)
+    metered = any(meter is not None for meter in meters)
+    stopped = [False] * len(conclusions)
+    found = []  # (номер заключения, правило), найденные на текущем шаге поиска
+
+    # предикаты, разрешенные в посылках заключения (PredicateTable.init), по позициям PredicateTable.predicates
+    permitted = np.zeros((len(conclusions), len(pt.predicates)), dtype=bool)
+    for i, conclusion in enumerate(conclusions):
+        used = pt.init(conclusion).used
+        permitted[i] = [used >> k & 1 for k in range(len(pt.predicates))]
+
+    def open_frame(iterlits: PredicateTable, depth: int, mask: RowMask, rules: Dict[int, Regularity]) -> SharedFrame:
+        searched = []
+        for i, rule in rules.items():
+            rule_mask = conclusion_mask(mask, conclusions[i], sample) if use_masks else None
+            if not __open_node(rule, depth, rule_mask, model, meters[i]):
+                searched.append(i)
+
+        candidates = list(iterlits) if searched else []
+        allowed = permitted[np.ix_(searched, [pt.index[lit] for lit in candidates])]
+        if mask is None or model.shared_measure is None:
+            probs = pvalues = None
+        else:
+            probs, pvalues = model.shared_measure(mask, [conclusions[i] for i in searched], candidates, model)
+            probs, pvalues = probs.tolist(), pvalues.tolist()
+        return SharedFrame(iterlits, depth, mask, rules, searched, candidates, allowed, probs, pvalues)
+
+    def close_frame(frame: SharedFrame) -> Dict[int, bool]:
+        results = {}
+        for i, rule in frame.rules.items():
+            if stopped[i]:
+                continue
+            base = []
+            results[i] = frame.enhance.get(i, False) or \
+                __check_base(rule, frame.depth, model, proba, fisher, base)
+            found.extend((i, rule) for rule in base)
+        return results
+
+    def __do_enhance(frame: SharedFrame) -> Optional[SharedFrame]:
+        j = frame.next
+        frame.next += 1
+        lit, depth = frame.candidates[j], frame.depth
+
+        children = {}
+        for r, i in enumerate(frame.searched):
+            if stopped[i] or not frame.allowed[r, j]:
+                continue
+
+            rule = frame.rules[i]
+            new_rule = rule.enhance(lit)
+            if new_rule.is_nonnegative():
+                __evaluate(new_rule, None, model, (frame.probs[r][j], frame.pvalues[r][j]) if frame.probs else None)
+
+            accepted, descend = __check_enhancement(new_rule, rule, lit, depth, model, proba, fisher)
+            if descend:
+                children[i] = new_rule
+            elif accepted:
+                found.append((i, new_rule))
+                frame.enhance[i] = True
+
+        if not children:
+            return None
+        return open_frame(frame.iterlits.drop(lit), depth + 1,
+                          extend_mask(frame.mask, lit, sample) if use_masks else None, children)
+
+    frames = [open_frame(pt, 0, free_mask(sample) if use_masks else None,
+                         {i: Regularity(conclusion) for i, conclusion in enumerate(conclusions)})]
+    while frames:
+        frame = frames[-1]
+        if stats is not None:
+            step_start = perf_counter()
+        if frame.next < len(frame.candidates):
+            child = __do_enhance(frame)
+            if child is not None:
+                frames.append(child)
         else:
+            results = close_frame(frames.pop())
+            if frames:
+                enhance = frames[-1].enhance
+                for i, enhanced in results.items():
+                    enhance[i] = enhance.get(i, False) or enhanced
+        if stats is not None:
+            stats.depth_time[frame.depth] += perf_counter() - step_start
+
+        for i, rule in found:
+            if meters[i] is None or meters[i].take([rule]):
+                yield i, rule
+        found.clear()
+
+        if metered:
+            for i, meter in enumerate(meters):
+                if not stopped[i] and meter is not None and meter.exceeded():
+                    stopped[i] = True
+            if all(stopped):
+                return
+
+
+def build_subtree(rule: Regularity,
+                  iterlits: PredicateTable,
+                  depth: int,
+                  model: BaseModel,
+                  split: Callable[[Regularity, PredicateTable, int], SubtreeResult] = None,
+                  split_depth: int = None,
+                  stack: List[FrameState] = None,
+                  on_step: Callable[[List[Frame]], None] = None,
+                  meter: BudgetMeter = None) -> Generator[Regularity, None, bool]:
+    """
+    Builds premises of the rule starting from `depth` (the subtree of the search rooted at the rule)
+    and yields found rules. The search is depth-first with an explicit stack of Frame;
+    with model.strategy == 'beam' it is build_beam (split, stack and on_step are not used then)
+
+    :param iterlits: predicates allowed for enhancing the premise
+    :param split: if passed, subtrees rooted at depth `split_depth` are not built,
+        split(rule, iterlits, depth) is called instead and its result is taken as the result of the subtree
+    :param stack: saved stack (Frame.state() of every frame) to continue the search from
+    :param on_step: on_step(stack) is called after every step of the search (when all rules found
+        so far are yielded), e.g. to save the stack
+    :param meter: budget of the search: expanded nodes and emitted rules are counted in it, when it is exceeded
+        the search stops after the current step (meter.reason is set)
+    :return: (value of StopIteration) True if the subtree gave a rule
+    """
+
+    if model.strategy == 'beam' and not (split is not None and depth == split_depth):
+        return (yield from build_beam(rule, iterlits, depth, model, meter))
+
+    # маски строк посылки передаются вниз по рекурсии, если мера умеет ими пользоваться
+    use_masks = model.mask_measure is not None
+    found = []  # правила, найденные на текущем шаге поиска
+    stats = model.stats
+    proba, fisher = __checks(model)
+
+    # Наращивание посылки: узел поиска или результат, если поддерево не строится
+    def open_frame(rule: Regularity, iterlits: PredicateTable, depth: int, mask: RowMask) -> Union[Frame, bool]:
+        if depth >= model.fully_depth:
             return False
+        if depth == split_depth and split is not None:
+            enhanced, rules = split(rule, iterlits, depth)
+            found.extend(rules)
+            return enhanced
 
-    def __do_check_base(rule: Regularity, depth: int, file) -> bool:
-        if depth == 0:
-            return True
-        elif depth <= model.base_depth:
-            if rule.is_nonnegative() and \
-                    rule.eval_pvalue(model) < model.confidence_level and \
-                    check_proba(rule, model) and \
-                    check_fisher(rule, model):
-                print(cstr(rule), file=file)
-                return True
-            else:
-                return False
+        candidates = [] if __open_node(rule, depth, mask, model, meter) else list(iterlits)
+        return Frame(rule, iterlits, depth, mask, candidates, __measure_extensions(rule, mask, candidates, model))
+
+    def restore_frame(state: FrameState) -> Frame:
+        rule, used, depth, next_candidate, enhance = state
+        frame = open_frame(rule, model.sample.pt.subtable(used), depth,
+                           premise_mask(rule, model.sample) if use_masks else None)
+        frame.next, frame.enhance = next_candidate, enhance
+        return frame
+
+    def close_frame(frame: Frame) -> bool:
+        if not frame.enhance:
+            return __check_base(frame.rule, frame.depth, model, proba, fisher, found)
         else:
-            print(cstr(rule), file=file)
             return True
 
-    def __do_enhance(lit: Predicate,
-                     rule: Regularity,
-                     iterlits: PredicateTable,
-                     depth: int,
-                     file) -> bool:
+    def __emitted() -> List[Regularity]:
+        # найденные правила, укладывающиеся в бюджет
+        return found if meter is None else meter.take(found)
+
+    def __do_enhance(frame: Frame) -> Union[Frame, bool]:
+        lit, measured = frame.candidates[frame.next], frame.measured[frame.next]
+        frame.next += 1
+        rule, depth = frame.rule, frame.depth
 
         new_rule = rule.enhance(lit)
-        if new_rule.is_nonnegative() and rule.eval_prob(model) < new_rule.eval_prob(model) and \
-                check_threshold(new_rule, rule, lit, model) and \
-                new_rule.eval_pvalue(model) < model.confidence_level and \
-                rule.eval_pvalue(model) > new_rule.eval_pvalue(model) and \
-                check_proba(new_rule, model) and \
-                check_fisher(new_rule, model):
-
-            if depth == model.fully_depth - 1:
-                print(cstr(new_rule), file=file)
-                return True
+        new_mask = extend_mask(frame.mask, lit, model.sample) if use_masks else None
+        if new_rule.is_nonnegative():
+            __evaluate(new_rule, new_mask, model, measured)
+
+        accepted, descend = __check_enhancement(new_rule, rule, lit, depth, model, proba, fisher)
+        if descend:
+            return open_frame(new_rule, frame.iterlits.drop(lit), depth + 1, new_mask)
+        if accepted:
+            found.append(new_rule)
+        return accepted
+
+    if stack is not None:
+        frames = [restore_frame(state) for state in stack]
+    else:
+        root = open_frame(rule, iterlits, depth, premise_mask(rule, model.sample) if use_masks else None)
+        if not isinstance(root, Frame):
+            yield from __emitted()
+            return root
+        frames = [root]
+
+    # результат поддерева сразу учитывается в родительском узле, поэтому стек полностью описывает состояние поиска
+    while True:
+        frame = frames[-1]
+        if stats is not None:
+            step_start = perf_counter()
+        if frame.next < len(frame.candidates):
+            child = __do_enhance(frame)
+            if isinstance(child, Frame):
+                frames.append(child)
             else:
-                return build_premise(new_rule, iterlits.drop(lit), depth + 1, file)
+                frame.enhance |= child
+        else:
+            enhanced = close_frame(frames.pop())
+            if frames:
+                frames[-1].enhance |= enhanced
+        if stats is not None:
+            stats.depth_time[frame.depth] += perf_counter() - step_start
+
+        if not frames:
+            yield from __emitted()
+            return enhanced
+
+        if found:
+            yield from __emitted()
+            found.clear()
+        if meter is not None and meter.exceeded():
+            return False
+        if on_step is not None:
+            on_step(frames)
+
+
+class BeamNode:
+    """
+    Partial rule kept in the beam: the rule, its allowed predicates, the parent node with the predicate
+    enhancing its premise, premise row mask (while the node is expanded) and whether any enhancement gave a rule
+    """
+    __slots__ = ('rule', 'iterlits', 'depth', 'parent', 'lit', 'mask', 'expanded', 'enhance')
+
+    def __init__(self,
+                 rule: Regularity,
+                 iterlits: PredicateTable,
+                 depth: int,
+                 parent: Optional['BeamNode'] = None,
+                 lit: Optional[Predicate] = None) -> None:
+        self.rule = rule
+        self.iterlits = iterlits
+        self.depth = depth
+        self.parent = parent
+        self.lit = lit
+        self.mask: Optional[RowMask] = None
+        self.expanded = False
+        self.enhance = False
+
+
+def build_beam(rule: Regularity,
+               iterlits: PredicateTable,
+               depth: int,
+               model: BaseModel,
+               meter: BudgetMeter = None) -> Generator[Regularity, None, bool]:
+    """
+    Beam version of build_subtree: the premises are built level by level and only model.beam_width
+    best partial rules of every level (by conditional probability, then by p-value) are enhanced further.
+    Enhancements are accepted by the same checks as in the exhaustive search and a rule is found
+    when none of its explored enhancements gave a rule, so the work is bounded by
+    beam_width * fully_depth nodes at the cost of completeness
+    """
+    if depth >= model.fully_depth:
+        return False
+
+    use_masks = model.mask_measure is not None
+    found = []
+    stats = model.stats
+    proba, fisher = __checks(model)
+
+    def __emitted() -> List[Regularity]:
+        return found if meter is None else meter.take(found)
+
+    def __expand(node: BeamNode, children: List[BeamNode]) -> None:
+        rule, depth = node.rule, node.depth
+        candidates = [] if __open_node(rule, depth, node.mask, model, meter) else list(node.iterlits)
+        for lit, measured in zip(candidates, __measure_extensions(rule, node.mask, candidates, model)):
+            new_rule = rule.enhance(lit)
+            # меры нужны и для ранжирования, поэтому считаются для всех расширений
+            __evaluate(new_rule, None, model, measured)
+
+            accepted, descend = __check_enhancement(new_rule, rule, lit, depth, model, proba, fisher)
+            # принятое расширение дает правило (см. build_subtree), даже если оно не попадет в луч
+            node.enhance |= accepted
+            if descend:
+                children.append(BeamNode(new_rule, node.iterlits.drop(lit), depth + 1, node, lit))
+            elif accepted:
+                found.append(new_rule)
+        node.expanded = True
 
-        elif depth < model.base_depth:
-            return build_premise(new_rule, iterlits.drop(lit), depth + 1, file)
+    def __rank(node: BeamNode) -> Tuple[float, float]:
+        return -node.rule.eval_prob(model), node.rule.eval_pvalue(model)
+
+    root = BeamNode(rule, iterlits, depth)
+    root.mask = premise_mask(rule, model.sample) if use_masks else None
+    levels = [[root]]
+    while levels[-1]:
+        children = []
+        for node in levels[-1]:
+            if stats is not None:
+                step_start = perf_counter()
+            __expand(node, children)
+            if stats is not None:
+                stats.depth_time[node.depth] += perf_counter() - step_start
+
+            if found:
+                yield from __emitted()
+                found.clear()
+            if meter is not None and meter.exceeded():
+                break
+        if meter is not None and meter.exceeded():
+            break
+
+        beam = heapq.nsmallest(model.beam_width, children, key=__rank)
+        for child in beam:
+            child.mask = extend_mask(child.parent.mask, child.lit, model.sample) if use_masks else None
+        for node in levels[-1]:
+            node.mask = None
+        levels.append(beam)
+
+    # результаты узлов передаются родителям снизу вверх, как при закрытии узлов в build_subtree
+    enhanced = False
+    for level in reversed(levels):
+        for node in level:
+            if not node.expanded:
+                continue
+            enhanced = node.enhance or __check_base(node.rule, node.depth, model, proba, fisher, found)
+            if node.parent is not None:
+                node.parent.enhance |= enhanced
+    yield from __emitted()
+    return enhanced
+
+
+def __checks(model: BaseModel) -> Tuple[Callable, Callable]:
+    # check_proba и check_fisher, при сборе статистики -- с подсчетом вызовов и времени
+    if model.stats is not None:
+        return model.stats.timed('check_proba', check_proba), model.stats.timed('check_fisher', check_fisher)
+    return check_proba, check_fisher
+
+
+def __open_node(rule: Regularity, depth: int, mask: RowMask, model: BaseModel, meter: BudgetMeter) -> bool:
+    """
+    Evaluates the rule of the expanded search node
+    :return: True if its enhancements do not have to be tried
+    """
+    __evaluate(rule, mask, model)
+    hopeless = __is_hopeless(rule, mask, model)
+    if model.stats is not None:
+        model.stats.nodes[depth] += 1
+        model.stats.pruned[depth] += hopeless
+    if meter is not None:
+        meter.node()
+    return hopeless
+
+
+def __check_base(rule: Regularity, depth: int, model: BaseModel, proba: Callable, fisher: Callable,
+                 found: List[Regularity]) -> bool:
+    # правило без принятых расширений
+    if depth == 0:
+        return True
+    elif depth <= model.base_depth:
+        if rule.is_nonnegative() and \
+                rule.eval_pvalue(model) < model.confidence_level and \
+                proba(rule, model) and \
+                fisher(rule, model):
+            found.append(rule)
+            return True
         else:
             return False
+    else:
+        found.append(rule)
+        return True
+
+
+def __evaluate(rule: Regularity, mask: RowMask, model: BaseModel, measured: Tuple[float, float] = None) -> None:
+    if measured is not None:
+        rule.evaluate(model, measure=lambda *_: measured)
+    elif mask is not None:
+        rule.evaluate(model, measure=partial(model.mask_measure, mask))
+
+
+def __is_hopeless(rule: Regularity, mask: RowMask, model: BaseModel) -> bool:
+    # ни одно расширение правила не пройдет порог confidence_level, поэтому поддерево можно не строить:
+    # правило печатается только с p-value < confidence_level
+    if mask is None or model.pvalue_bound is None:
+        return False
+    return model.pvalue_bound(mask, rule, model) >= model.confidence_level * (1 + 1e-9)
 
-    build_conclusion()
+
+def __measure_extensions(rule: Regularity, mask: RowMask, candidates: List[Predicate], model: BaseModel) -> List:
+    # меры всех расширений правила считаются одной векторной операцией
+    if mask is None or model.batch_measure is None:
+        return [None] * len(candidates)
+    return list(zip(*model.batch_measure(mask, rule, candidates, model)))
+
+
+def __check_enhancement(new_rule: Regularity, rule: Regularity, lit: Predicate, depth: int, model: BaseModel,
+                        proba: Callable, fisher: Callable) -> Tuple[bool, bool]:
+    """
+    Decision on the enhancement of the premise of a search node at `depth`, common to all search strategies
+    :return: (whether the enhancement is accepted, whether its subtree is searched);
+        an accepted enhancement whose subtree is not searched is a found rule
+    """
+    rejected = __rejected_by(new_rule, rule, lit, model, proba, fisher)
+    if model.stats is not None:
+        model.stats.checks[rejected or 'accepted'] += 1
+    # отвергнутые расширения наращиваются до base_depth, принятые -- до fully_depth
+    descend = (rejected is None or depth < model.base_depth) and depth + 1 < model.fully_depth
+    return rejected is None, descend
+
+
+def __rejected_by(new_rule: Regularity, rule: Regularity, lit: Predicate, model: BaseModel,
+                  proba: Callable, fisher: Callable) -> Optional[str]:
+    # первая не пройденная проверка расширения, None -- расширение принято
+    if not new_rule.is_nonnegative():
+        return 'is_nonnegative'
+    if not rule.eval_prob(model) < new_rule.eval_prob(model):
+        return 'prob'
+    if not check_threshold(new_rule, rule, lit, model):
+        return 'check_threshold'
+    if not new_rule.eval_pvalue(model) < model.confidence_level:
+        return 'pvalue'
+    if not rule.eval_pvalue(model) > new_rule.eval_pvalue(model):
+        return 'pvalue_decrease'
+    if not proba(new_rule, model):
+        return 'check_proba'
+    if not fisher(new_rule, model):
+        return 'check_fisher'
+    return None
 
 
 def check_threshold(new_rule: Regularity, rule: Regularity, lit: Predicate, model: BaseModel) -> bool:
@@ -108,26 +883,15 @@ def check_fisher(rule: Regularity, model: BaseModel) -> bool:
     :params model: BaseModel object
     :return:
     """
-    is_true = lambda obj, subpremise: all(pr[obj] for pr in subpremise)
-
-    for lit in rule.premise:
-        subpremise = [p for p in rule.premise if p != lit]
-
-        top = 0
-        bottom = 0
-        cons_count = 0
-        all_sum = 0
-        for obj in model.sample.data:
-            if is_true(obj, subpremise):
-                all_sum += 1
-                if rule.conclusion[obj]:
-                    cons_count += 1
-                    if lit[obj]:
-                        top += 1
-                if lit[obj]:
-                    bottom += 1
+    if len(rule.premise) == 0:
+        return True
+
+    # таблицы сопряженности всех подправил без одного литерала считаются за один проход,
+    # p-значения не сохраняются, поэтому достаточно решить, меньше ли они порога
+    tables = zip(*(counts.tolist() for counts in loo_contingency(rule, model.sample)))
 
+    for top, bottom, cons_count, all_sum in tables:
         crosstab = [[top, bottom - top], [cons_count - top, all_sum - cons_count - bottom + top]]
-        if p_value := fisher_exact(crosstab) >= model.confidence_predicate:
+        if not fisher_exact_below(crosstab, model.confidence_predicate, model.sample.log_factorial):
             return False
     return True
@@ -1,5 +1,9 @@
+from .budget import Budget
 from .data import *
-from ..utils.measure import std_measure
+from ..utils.fisher import fisher_exact_batch
+from ..utils.measure import std_measure, std_mask_measure, std_batch_measure, std_pvalue_bound, \
+    std_shared_batch_measure, MeasureCache
+from ..utils.stats import SearchStats
 
 
 class BaseModel:
@@ -11,7 +15,12 @@ class BaseModel:
                  confidence_predicate: float = 0.05,
                  negative_threshold: float = 0.,
                  measure: Union[Callable[[Regularity, 'BaseModel'], Tuple[float, float]], str] = 'std',
-                 rules_write_path: str = 'pcr/') -> None:
+                 rules_write_path: str = 'pcr/',
+                 cache_size: Optional[int] = 2 ** 17,
+                 stats: bool = False,
+                 budget: Budget = None,
+                 strategy: str = 'dfs',
+                 beam_width: int = 64) -> None:
 
         self.path = rules_write_path
         self.sample = sample
@@ -37,7 +46,46 @@ class BaseModel:
         else:
             self.negative_threshold = negative_threshold
 
+        # mask_measure считает меру по уже известной маске строк посылки,
+        # batch_measure -- меры всех расширений правила сразу,
+        # shared_measure -- меры расширений посылки для всех заключений сразу (см. build_spcr(premise_first=True)),
+        # pvalue_bound -- нижнюю границу p-value всех расширений правила; есть только у стандартной меры,
+        # fisher -- точный тест Фишера, которым стандартная мера считает p-value
         if measure == 'std':
             self.measure = std_measure
+            self.mask_measure = std_mask_measure
+            self.batch_measure = std_batch_measure
+            self.shared_measure = std_shared_batch_measure
+            self.pvalue_bound = std_pvalue_bound
+            self.fisher = fisher_exact_batch
         elif type(measure).__name__ == 'function':
             self.measure = measure
+            self.mask_measure = None
+            self.batch_measure = None
+            self.shared_measure = None
+            self.pvalue_bound = None
+            self.fisher = None
+
+        # кэш мер правил, ключ -- (множество предикатов посылки, заключение); None отключает кэш
+        self.cache = MeasureCache(cache_size) if cache_size else None
+
+        # счетчики поиска (SearchStats), None -- не собираются; меры оборачиваются для подсчета вызовов и времени
+        self.stats = SearchStats() if stats else None
+        if self.stats is not None:
+            for name in ('measure', 'mask_measure', 'batch_measure', 'shared_measure', 'pvalue_bound', 'fisher'):
+                if getattr(self, name) is not None:
+                    setattr(self, name, self.stats.timed(name, getattr(self, name)))
+
+        # ограничения поиска одного заключения, при их исчерпании выводятся уже найденные правила
+        self.budget = budget
+
+        # 'dfs' -- полный перебор посылок в глубину, 'beam' -- поиск лучом ширины beam_width (см. build_beam)
+        if strategy not in ('dfs', 'beam'):
+            raise ValueError("strategy must be 'dfs' or 'beam'")
+        else:
+            self.strategy = strategy
+
+        if beam_width < 1:
+            raise ValueError('beam_width must be int and >= 1')
+        else:
+            self.beam_width = beam_width
@@ -0,0 +1,93 @@
+from math import log
+from sys import float_info
+from typing import *
+
+from ..lang.predicate import Predicate
+from ..lang.regularity import Regularity
+
+# вес правила с вероятностью 1: -log(1 - p) бесконечен, поэтому 1 - p ограничивается снизу машинным эпсилоном
+MAX_WEIGHT = -log(float_info.epsilon)
+
+
+def rule_weight(prob: float) -> float:
+    """
+    Weight -log(1 - prob) of a rule in the consistency of an object, MAX_WEIGHT for prob = 1
+    """
+    if prob >= 1:
+        return MAX_WEIGHT
+    return min(-log(1 - prob), MAX_WEIGHT)
+
+
+class RuleIndex:
+    """
+    Rules compiled for the fix-point search: weights of the rules and inverted indices from a predicate
+    to the rules having it in the premise or as the conclusion, and from a feature to the rules with
+    its predicates in the premise.
+    Rules are referred to by their positions in `rules`, every index lists them in ascending order
+    """
+
+    def __init__(self, rules: Iterable[Regularity], model=None) -> None:
+        """
+        :param model: BaseModel to evaluate probabilities of the rules that have none (e.g. not loaded with decstr)
+        """
+        self.rules: List[Regularity] = list(rules)
+        self.weights: List[float] = [rule_weight(self.__prob(rule, model)) for rule in self.rules]
+        self.by_premise: Dict[Predicate, List[int]] = {}
+        self.by_feature: Dict[int, List[int]] = {}
+        self.by_conclusion: Dict[Predicate, List[int]] = {}
+
+        for i, rule in enumerate(self.rules):
+            for pr in rule.premise:
+                self.by_premise.setdefault(pr, []).append(i)
+            for feature in {pr.name for pr in rule.premise}:
+                self.by_feature.setdefault(feature, []).append(i)
+            self.by_conclusion.setdefault(rule.conclusion, []).append(i)
+
+        self.__layout = None
+
+    def layout(self, pt) -> Tuple[List[int], List[int], List[int], List[int], List[bool]]:
+        """
+        Bitmasks of every rule over pt.predicates (see Object): of the premise predicates, of the features of
+        the premise predicates missing in pt, of the conclusion and of its negation (0 if it is missing in pt),
+        and whether the rule has predicates missing in pt (the masks do not describe them for an object
+        keeping such predicates in Object.extra). Computed once for the predicates of pt
+        """
+        if self.__layout is not None and self.__layout[0] is pt.predicates:
+            return self.__layout[1]
+
+        def bit(p: Predicate) -> int:
+            return 1 << i if (i := pt.index.get(p)) is not None else 0
+
+        premise, foreign, conclusion, negation, outside = [], [], [], [], []
+        for rule in self.rules:
+            premise.append(sum(bit(pr) for pr in rule.premise))
+            foreign.append(sum(pt.feature_bits.get(pr.name, 0) for pr in rule.premise if pr not in pt.index))
+            conclusion.append(bit(rule.conclusion))
+            negation.append(bit(~ rule.conclusion))
+            outside.append(any(pr not in pt.index for pr in (*rule.premise, rule.conclusion, ~ rule.conclusion)))
+
+        self.__layout = pt.predicates, (premise, foreign, conclusion, negation, outside)
+        return self.__layout[1]
+
+    @staticmethod
+    def __prob(rule: Regularity, model) -> float:
+        if rule.prob is not None:
+            return rule.prob
+        if model is None:
+            raise ValueError(f'rule {rule} has no probability, pass model to evaluate it')
+        return rule.eval_prob(model)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def __iter__(self) -> Iterator[Regularity]:
+        return iter(self.rules)
+
+    def with_premise(self, p: Predicate) -> List[int]:
+        return self.by_premise.get(p, [])
+
+    def with_feature(self, feature: int) -> List[int]:
+        return self.by_feature.get(feature, [])
+
+    def with_conclusion(self, p: Predicate) -> List[int]:
+        return self.by_conclusion.get(p, [])
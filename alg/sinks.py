@@ -0,0 +1,205 @@
+import os
+from abc import ABC, abstractmethod
+from typing import *
+
+from ..lang.parser import cstr
+from ..lang.predicate import Predicate
+from ..lang.regularity import Regularity
+from ..lang.ruleset import RuleSet
+
+
+class RuleSink(ABC):
+    """
+    Receiver of rules found by build_spcr. Rules of every conclusion come between open(conclusion) and close(),
+    write() collects them to the buffer which is passed to dump() every `buffer_size` rules.
+    Conclusions whose search was stopped by a budget are collected in `truncated`
+    """
+    persistent: bool = False  # output survives a crash, so the search can be resumed from a checkpoint
+    path: Optional[str] = None  # output directory, if any
+
+    def __init__(self, buffer_size: int = 1024) -> None:
+        if buffer_size < 1:
+            raise ValueError('buffer_size must be int and >= 1')
+        self.buffer_size = buffer_size
+        self.buffer: List[Regularity] = []
+        self.conclusion: Optional[Predicate] = None
+        self.truncated: Dict[Predicate, str] = {}  # заключение -> исчерпанный лимит бюджета
+
+    def open(self, conclusion: Predicate, resume_from: int = None) -> None:
+        """
+        :param resume_from: position() saved in a checkpoint, the output after it is discarded
+        """
+        if resume_from is not None and not self.persistent:
+            raise ValueError(f'{type(self).__name__} can not be resumed')
+        self.conclusion = conclusion
+
+    def write(self, rule: Regularity) -> None:
+        self.buffer.append(rule)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.buffer:
+            self.dump(self.buffer)
+            self.buffer = []
+
+    def close(self, truncated: str = None) -> None:
+        """
+        :param truncated: if the search of the conclusion was stopped by a budget, the exhausted limit
+            ('seconds', 'nodes' or 'rules'): only a part of its rules was written
+        """
+        self.flush()
+        if truncated is not None:
+            self.truncated[self.conclusion] = truncated
+        self.conclusion = None
+
+    def position(self) -> Optional[int]:
+        """
+        Makes the output of the current conclusion durable and returns its size (None if it is not persistent)
+        """
+        self.flush()
+        return None
+
+    @abstractmethod
+    def dump(self, rules: List[Regularity]) -> None:
+        pass
+
+
+class TextSink(RuleSink):
+    """
+    Writes cstr lines of the rules to file spcr_<conclusion>.txt in `path`.
+    A truncated conclusion is marked by the comment line `# truncated: <limit>` at the end of the file
+    """
+    persistent = True
+
+    def __init__(self, path: str, buffer_size: int = 1024, sync: bool = False) -> None:
+        """
+        :param sync: write every file to disk on close (needed for checkpoints to survive a node failure)
+        """
+        super().__init__(buffer_size)
+        self.path = path
+        self.sync = sync
+        self.__file = None
+
+    def open(self, conclusion: Predicate, resume_from: int = None) -> None:
+        super().open(conclusion, resume_from)
+        filename = f"{self.path}spcr_{str(conclusion)}.txt"
+        if resume_from is None:
+            self.__file = open(filename, 'w')
+        else:
+            self.__file = open(filename, 'r+')
+            self.__file.seek(resume_from)
+            self.__file.truncate()
+
+    def dump(self, rules: List[Regularity]) -> None:
+        self.__file.write(''.join(cstr(rule) + '\n' for rule in rules))
+
+    def close(self, truncated: str = None) -> None:
+        self.flush()
+        if truncated is not None:
+            self.__file.write(f'# truncated: {truncated}\n')
+        super().close(truncated)
+        if self.sync:
+            self.__sync()
+        self.__file.close()
+        self.__file = None
+
+    def position(self) -> int:
+        self.flush()
+        self.__sync()
+        return self.__file.tell()
+
+    def __sync(self) -> None:
+        self.__file.flush()
+        os.fsync(self.__file.fileno())
+
+
+class ListSink(RuleSink):
+    """
+    Collects the rules of all conclusions to list `rules`
+    """
+
+    def __init__(self, buffer_size: int = 1024) -> None:
+        super().__init__(buffer_size)
+        self.rules: List[Regularity] = []
+
+    def dump(self, rules: List[Regularity]) -> None:
+        self.rules.extend(rules)
+
+
+class RuleSetSink(RuleSink):
+    """
+    Collects the rules of all conclusions to compact RuleSet `ruleset`
+    """
+
+    def __init__(self, buffer_size: int = 1024) -> None:
+        super().__init__(buffer_size)
+        self.ruleset = RuleSet()
+
+    def dump(self, rules: List[Regularity]) -> None:
+        self.ruleset.extend(rules)
+
+
+class RuleStoreSink(RuleSink):
+    """
+    Writes the rules of every conclusion to binary RuleSet file spcr_<conclusion>.npz in `path`
+    (read it with RuleSet.load). The file is rewritten atomically on close and position(),
+    so it is always a complete set. Truncated conclusions are reported in `truncated` only
+    """
+    persistent = True
+
+    def __init__(self, path: str, buffer_size: int = 1024, sync: bool = False) -> None:
+        """
+        :param sync: write every file to disk on close (needed for checkpoints to survive a node failure)
+        """
+        super().__init__(buffer_size)
+        self.path = path
+        self.sync = sync
+        self.ruleset: Optional[RuleSet] = None
+
+    def open(self, conclusion: Predicate, resume_from: int = None) -> None:
+        super().open(conclusion, resume_from)
+        if resume_from is None:
+            self.ruleset = RuleSet()
+        else:
+            saved = RuleSet.load(self.__filename())
+            self.ruleset = RuleSet(saved[i] for i in range(resume_from))
+
+    def dump(self, rules: List[Regularity]) -> None:
+        self.ruleset.extend(rules)
+
+    def close(self, truncated: str = None) -> None:
+        self.flush()
+        self.__save(self.sync)
+        super().close(truncated)
+        self.ruleset = None
+
+    def position(self) -> int:
+        self.flush()
+        self.__save(True)
+        return len(self.ruleset)
+
+    def __filename(self) -> str:
+        return f"{self.path}spcr_{str(self.conclusion)}.npz"
+
+    def __save(self, sync: bool) -> None:
+        tmp = self.__filename() + '.tmp'
+        with open(tmp, 'wb') as f:
+            self.ruleset.save(f)
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, self.__filename())
+
+
+class CallbackSink(RuleSink):
+    """
+    Passes the rules to callback(conclusion, rules) by batches of `buffer_size` rules
+    """
+
+    def __init__(self, callback: Callable[[Predicate, List[Regularity]], Any], buffer_size: int = 1024) -> None:
+        super().__init__(buffer_size)
+        self.callback = callback
+
+    def dump(self, rules: List[Regularity]) -> None:
+        self.callback(self.conclusion, rules)
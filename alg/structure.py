@@ -1,4 +1,5 @@
 from copy import copy, deepcopy
+from types import MappingProxyType
 
 import pandas as pd
 
@@ -10,19 +11,31 @@ from ..utils.sys import is_none
 
 
 class Object:
-    table: Dict[int, Set[Predicate]] = None
+    """
+    Set of predicates grouped by features. If the object has a PredicateTable, it is stored as bitmasks
+    over pt.predicates: `bits` -- predicates of the object and `known` -- all predicates of its features
+    (a feature may stay in the object without predicates); the features and predicates missing in pt
+    (e.g. floating features, which pt does not encode) are kept in the table `extra`.
+    Otherwise (e.g. loaded by from_dict without pt) it is stored as the table {feature: set of predicates}.
+    The table of an object stored as bitmasks is a read-only snapshot built from them,
+    the object is changed by update / remove or by setting `table`
+    """
     pt: PredicateTable = None
+    bits: int = 0  # bit i <-> pt.predicates[i] is in the object
+    known: int = 0  # bits of all predicates of the features present in the object
+    extra: Dict[int, Set[Predicate]] = None  # predicates missing in pt: {feature: set of predicates}
 
     # TODO add transform mode
     def __init__(self, data: Union[pd.Series, Dict],
                  pt: PredicateTable = None,
                  identifier: Union[str, int] = None) -> None:
         self.id = identifier
+        self.__table = None
         if pt is None and type(data) is dict:
-            self.table = data
+            self.__table = data
         else:
             self.pt = pt
-            self.table = {
+            self.__set_table({
                 pt.pe.cd.features[col]: {
                     pt.pe.transform(
                         Predicate(col,
@@ -32,40 +45,124 @@ class Object:
                                   )
                     )
                 } for col in data.keys() if not is_none(data[col])
-            }
+            })
+
+    @property
+    def table(self) -> Mapping[int, AbstractSet[Predicate]]:
+        if self.pt is None:
+            return self.__table
+        # изменения снимка не дошли бы до битовых масок, поэтому он только для чтения
+        return MappingProxyType({feature: frozenset(pr_set) for feature, pr_set in self.__bits_table().items()})
+
+    @table.setter
+    def table(self, table: Dict[int, Set[Predicate]]) -> None:
+        if self.pt is None:
+            self.__table = table
+        else:
+            self.__set_table(table)
+
+    def __bits_table(self) -> Dict[int, Set[Predicate]]:
+        table = {}
+        for feature, feature_bits in sorted(self.pt.feature_bits.items()):
+            if self.known & feature_bits:
+                table[feature] = set(self.__predicates(self.bits & feature_bits))
+        for feature, pr_set in self.extra.items():
+            table.setdefault(feature, set()).update(pr_set)
+        return table
+
+    def __set_table(self, table: Mapping[int, AbstractSet[Predicate]]) -> None:
+        self.bits = self.known = 0
+        self.extra = {}
+        for feature, pr_set in table.items():
+            if (feature_bits := self.pt.feature_bits.get(feature)) is not None:
+                self.known |= feature_bits
+            else:
+                # признак не закодирован в pt: он остается в объекте и без предикатов
+                self.extra[feature] = set()
+            for pr in pr_set:
+                self.__include(pr)
+
+    def __include(self, pr: Predicate) -> None:
+        if (i := self.pt.index.get(pr)) is not None:
+            self.bits |= 1 << i
+        else:
+            self.extra.setdefault(pr.name, set()).add(pr)
+
+    def __exclude(self, pr: Predicate) -> None:
+        if (i := self.pt.index.get(pr)) is not None:
+            self.bits &= ~(1 << i)
+            return
+        self.extra[pr.name].discard(pr)
+        # признак из pt представлен маской known, пустое множество ему не нужно
+        if not self.extra[pr.name] and pr.name in self.pt.feature_bits:
+            del self.extra[pr.name]
+
+    def attach(self, pt: PredicateTable) -> None:
+        """
+        Stores the object as bitmasks over the predicates of pt
+        """
+        table = self.table
+        self.pt = pt
+        self.__set_table(table)
+        self.__table = None
+
+    def __predicates(self, bits: int) -> Iterator[Predicate]:
+        while bits:
+            low = bits & -bits
+            yield self.pt.predicates[low.bit_length() - 1]
+            bits ^= low
+
+    def __derive(self, bits: int, known: int) -> 'Object':
+        # соседний объект: PredicateTable общая, меняются только битовые маски
+        new_obj = copy(self)
+        new_obj.bits = bits
+        new_obj.known = known
+        return new_obj
 
     def __iter__(self) -> Iterator:
+        if self.pt is not None:
+            yield from self.__predicates(self.bits)
+            for pr_set in self.extra.values():
+                yield from pr_set
+            return
+
         for k, v in self.table.items():
             for p in v:
                 yield p
 
+    def has_feature(self, feature: int) -> bool:
+        if self.pt is not None:
+            return bool(self.known & self.pt.feature_bits.get(feature, 0)) or feature in self.extra
+        return feature in self.table
+
     def check_contradiction(self) -> bool:
         # contradiction if object contains p and ~p
-        for feature in self.table.keys():
-            for pr in self.table[feature]:
-                if ~pr in self.table[feature]:
-                    return True
+        for pr in self:
+            if ~pr in self:
+                return True
         return False
 
     def completion(self, pt: PredicateTable = None) -> None:
         if self.pt is None and pt is None:
             raise TypeError("self.pt is empty. second argument 'pt' is required")
-        elif pt is not None:
-            self.pt = pt
+        elif pt is not None and pt is not self.pt:
+            # маски строятся заново: порядок предикатов другой таблицы может отличаться
+            self.attach(pt)
         # add all neg predicates for each pos predicate
-        for feature in self.table.keys():
-            new_features = set()
-            for pr in self.table[feature]:
-                new_features.add(pr)
-                if pr.is_positive():
-                    for pr_tuple in self.pt.table[feature]:
-                        if pr_tuple[0] != pr:
-                            new_features.add(pr_tuple[1])
-
-            self.table[feature] = new_features
+        for pr in list(self):
+            if pr.is_positive():
+                # у признаков, не закодированных в pt, отрицаний нет
+                for pr_tuple in self.pt.table.get(pr.name, ()):
+                    if pr_tuple[0] != pr:
+                        self.__include(pr_tuple[1])
 
     def decompletion(self) -> None:
         # delete all neg predicates
+        if self.pt is not None:
+            self.__set_table({feature: pos_pr for feature, pr_set in self.__bits_table().items()
+                              if (pos_pr := {pr for pr in pr_set if pr.is_positive() or pr.vtype == Var.Bool})})
+            return
+
         new_table = {}
         for feature in self.table.keys():
             pos_pr = set()
@@ -80,13 +177,29 @@ class Object:
     def rule_applicability(self, reg: Regularity) -> bool:
         # проверяет, применимо ли правило к объекту, т.е.   #TODO add transform mode
         # reg.premise подмножество self
+        if self.pt is not None:
+            # предикаты признаков объекта, которых в нем нет
+            missing = self.known & ~self.bits
+            for pr in reg.premise:
+                if (i := self.pt.index.get(pr)) is not None:
+                    if missing >> i & 1:
+                        return False
+                elif self.has_feature(pr.name) and pr not in self.extra.get(pr.name, ()):
+                    return False
+            return True
+
         for pr in reg.premise:
             if (pr_set := self.table.get(pr.name)) is not None and pr not in pr_set:
                 return False
         return True
 
     def add(self, p: Predicate) -> 'Object':
-        # добавляет предикат в объект и возвращает копию    #TODO need deepcopy?
+        # добавляет предикат в объект и возвращает копию
+        if self.pt is not None:
+            new_obj = self.__derive(self.bits, self.known | self.pt.feature_bits.get(p.name, 0))
+            new_obj.__include(p)
+            return new_obj
+
         new_obj = Object(deepcopy(self.table))
         if (new_pr_set := new_obj.table.get(p.name)) is not None:
             new_pr_set.add(p)
@@ -97,24 +210,46 @@ class Object:
 
     def delete(self, p: Predicate) -> 'Object':
         # удаляет предикат из объекта
-        # first check is table contains predicate       #TODO add error
-        if p not in self.table[p.name]:
+        if p not in self:
             raise ValueError("Attempt to delete a nonexistent predicate")
 
+        if self.pt is not None:
+            new_obj = self.__derive(self.bits, self.known)
+            new_obj.__exclude(p)
+            return new_obj
+
         new_obj = Object(deepcopy(self.table))
         new_obj.table[p.name].remove(p)
         return new_obj
 
     def update(self, p: Predicate) -> None:
+        if self.pt is not None:
+            if not self.has_feature(p.name):
+                raise KeyError(p.name)
+            self.__include(p)
+            return
+
         self.table[p.name].add(p)
 
     def remove(self, p: Predicate) -> None:
+        if self.pt is not None:
+            if p not in self:
+                raise KeyError(p)
+            self.__exclude(p)
+            return
+
         self.table[p.name].remove(p)
 
     @staticmethod
-    def from_dict(new_dict: Dict) -> 'Object':
-        return Object(data={k: set(map(lambda x: Predicate.from_dict(x), v)) for k, v in new_dict['data'].items()},
-                      identifier=new_dict['id'])
+    def from_dict(new_dict: Dict, pt: PredicateTable = None) -> 'Object':
+        """
+        :param pt: PredicateTable of the predicates, if passed, the object is stored as bitmasks
+        """
+        obj = Object(data={k: set(map(lambda x: Predicate.from_dict(x), v)) for k, v in new_dict['data'].items()},
+                     identifier=new_dict['id'])
+        if pt is not None:
+            obj.attach(pt)
+        return obj
 
     def to_dict(self) -> Dict:
         return {'data': {k: list(map(lambda x: x.to_dict(), v)) for k, v in self.table.items()}, 'id': self.id}
@@ -123,33 +258,65 @@ class Object:
         return Object(data={k: set(map(pe.inverse_transform, v)) for k, v in self.table.items()})
 
     def __eq__(self, other: 'Object') -> bool:
+        if self.pt is not None and other.pt is not None and self.pt.predicates is other.pt.predicates:
+            return self.bits == other.bits and self.known == other.known and self.extra == other.extra
         return self.table == other.table
 
+    def __hash__(self) -> int:
+        # хэш масок согласован с __eq__ объектов одной кодировки предикатов; объект-таблица хэшируется
+        # по таблице, поэтому равные объекты при разном хранении в одном множестве не совпадут
+        if self.pt is not None:
+            return hash((id(self.pt.predicates), self.bits, self.known))
+        return hash(frozenset((k, frozenset(v)) for k, v in self.table.items()))
+
     def __len__(self) -> int:
+        if self.pt is not None:
+            return bin(self.bits).count('1') + sum(map(len, self.extra.values()))
         return sum(map(len, self.table.values()))
 
     def __str__(self) -> str:
         str_obj = ""
-        for feature in self.table.keys():
+        table = self.table
+        for feature in table.keys():
             str_obj += str(feature) + ": {"
-            for pr in self.table[feature]:
+            for pr in table[feature]:
                 str_obj += str(pr)
             str_obj += "} "
         return str_obj
 
     def __contains__(self, pr: Predicate) -> bool:
         # проверяет, содержит ли объект предикат item
+        if self.pt is not None:
+            if (i := self.pt.index.get(pr)) is not None:
+                return bool(self.bits >> i & 1)
+            return pr in self.extra.get(pr.name, ())
         return pr in self.table.get(pr.name, [])
 
+    def __getstate__(self) -> Dict:
+        # PredicateTable (вместе с выборкой) не передается: объект передается таблицей,
+        # получатель может снова перевести его на битовые маски своей PredicateTable через attach
+        state = self.__dict__.copy()
+        for attr in ('pt', 'bits', 'known', 'extra'):
+            state.pop(attr, None)
+        state['_Object__table'] = self.__bits_table() if self.pt is not None else self.__table
+        return state
+
     def __copy__(self) -> 'Object':
-        new_obj = Object(copy(self.table))
+        new_obj = object.__new__(type(self))
+        new_obj.__dict__.update(self.__dict__)
+        if self.pt is None:
+            new_obj.__table = copy(self.__table)
+        elif self.extra is not None:
+            # extra меняется на месте (update / remove, add и delete копии), поэтому не разделяется с копией
+            new_obj.extra = {feature: set(pr_set) for feature, pr_set in self.extra.items()}
         return new_obj
 
-    def __deepcopy__(self) -> 'Object':
-        new_obj = Object(deepcopy(self.table))
+    def __deepcopy__(self, memo=None) -> 'Object':
+        new_obj = copy(self)
+        if self.pt is None:
+            new_obj.__table = deepcopy(self.__table)
         return new_obj
 
 
 class FixPoint(Object):
     ...
-
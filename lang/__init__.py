@@ -2,3 +2,4 @@ from . import opers
 from . import parser
 from . import predicate
 from . import regularity
+from . import ruleset
@@ -53,14 +53,16 @@ class Opers(Enum):
 
 
 class Oper(ABC):
-    params: Union[int, bool, float, Tuple[Union[int, float]], List[Union[int, float]]]
+    # операции не изменяются после создания: params задается только в __init__
+    __slots__ = ('params',)
+    params: Union[int, bool, float, Tuple[Union[int, float], ...]]
 
     @abstractmethod
     def __call__(self, x: ALLOWED_PYTHON_TYPES) -> ALLOWED_PYTHON_TYPES:
         pass
 
     def __hash__(self) -> int:
-        return hash(str(self))
+        return hash((type(self), self.params))
 
     @abstractmethod
     def __str__(self) -> str:
@@ -125,6 +127,7 @@ class Oper(ABC):
 
 
 class OperBinary(Oper, ABC):
+    __slots__ = ()
     params: ALLOWED_PYTHON_TYPES
 
     def arity(self) -> int:
@@ -135,6 +138,7 @@ class OperBinary(Oper, ABC):
 
 
 class Eq(OperBinary):
+    __slots__ = ()
 
     def __init__(self, params: ALLOWED_PYTHON_TYPES) -> None:
         self.params = params
@@ -159,6 +163,7 @@ class Eq(OperBinary):
 
 
 class Neq(OperBinary):
+    __slots__ = ()
 
     def __init__(self, params: ALLOWED_PYTHON_TYPES) -> None:
         self.params = params
@@ -180,6 +185,8 @@ class Neq(OperBinary):
 
 
 class Le(OperBinary):
+    __slots__ = ()
+
     def __init__(self, params: ALLOWED_PYTHON_TYPES) -> None:
         self.params = params
 
@@ -197,6 +204,8 @@ class Le(OperBinary):
 
 
 class Leq(OperBinary):
+    __slots__ = ()
+
     def __init__(self, params: ALLOWED_PYTHON_TYPES) -> None:
         self.params = params
 
@@ -214,6 +223,8 @@ class Leq(OperBinary):
 
 
 class Ge(OperBinary):
+    __slots__ = ()
+
     def __init__(self, params: ALLOWED_PYTHON_TYPES) -> None:
         self.params = params
 
@@ -231,6 +242,8 @@ class Ge(OperBinary):
 
 
 class Geq(OperBinary):
+    __slots__ = ()
+
     def __init__(self, params: ALLOWED_PYTHON_TYPES) -> None:
         self.params = params
 
@@ -248,12 +261,13 @@ class Geq(OperBinary):
 
 
 class In(Oper):
+    __slots__ = ()
 
-    def __init__(self, params: List[ALLOWED_PYTHON_TYPES]) -> None:
+    def __init__(self, params: Sequence[ALLOWED_PYTHON_TYPES]) -> None:
         if len(params) != 2:
             raise ValueError  # TODO дописать
         else:
-            self.params = params
+            self.params = tuple(params)
 
     def __call__(self, x: ALLOWED_PYTHON_TYPES) -> bool:
         return self.params[0] <= x <= self.params[1]
@@ -275,12 +289,13 @@ class In(Oper):
 
 
 class Nin(Oper):
+    __slots__ = ()
 
-    def __init__(self, params: List[ALLOWED_PYTHON_TYPES]) -> None:
+    def __init__(self, params: Sequence[ALLOWED_PYTHON_TYPES]) -> None:
         if len(params) != 2:
             raise ValueError  # TODO написать
         else:
-            self.params = params
+            self.params = tuple(params)
 
     def __call__(self, x: ALLOWED_PYTHON_TYPES) -> bool:
         return self.params[0] <= x <= self.params[1]
@@ -302,6 +317,11 @@ class Nin(Oper):
 
 
 class UndefinedOperation(Oper):
+    __slots__ = ()
+
+    def __init__(self) -> None:
+        self.params = None
+
     def __call__(self, x: Any) -> bool:
         return False
 
@@ -1,10 +1,11 @@
-from typing import List, Dict
+from typing import Iterator, List, Dict, Union
 from tqdm import tqdm
 import glob
 
 from .opers import Var
 from .predicate import Predicate
 from .regularity import Regularity
+from .ruleset import RuleSet
 
 
 def cstr(rule: Regularity) -> str:
@@ -24,7 +25,11 @@ def decstr_folder(path_to_folder: str,
                   cd: 'ColumnsDescription' = None,
                   ctype_dict: Dict[int, str] = None,
                   min_prob: float = None,
-                  max_pvalue: float = None) -> List[Regularity]:
+                  max_pvalue: float = None,
+                  as_ruleset: bool = False) -> Union[List[Regularity], RuleSet]:
+    """
+    :param as_ruleset: collect rules into compact RuleSet instead of list
+    """
 
     if ctype_dict is None:
         ctype_dict = {cd.features[feature_num]: feature_type for feature_num, feature_type in cd.type_dict.items()}
@@ -32,9 +37,9 @@ def decstr_folder(path_to_folder: str,
     if not path_to_folder.endswith('/') or not path_to_folder.endswith('\\'):
         path_to_folder = path_to_folder + '/'
 
-    rules = []
+    rules = RuleSet() if as_ruleset else []
     for file in tqdm(glob.glob(path_to_folder + '*.txt')):
-        rules.extend(decstr(file, ctype_dict, min_prob, max_pvalue))
+        rules.extend(read_rules(file, ctype_dict, min_prob, max_pvalue))
     return rules
 
 
@@ -42,10 +47,21 @@ def decstr(filename: str,
            ctype_dict: Dict[int, str],
            min_prob: float = None,
            max_pvalue: float = None) -> List[Regularity]:
+    return list(read_rules(filename, ctype_dict, min_prob, max_pvalue))
 
+
+def read_rules(filename: str,
+               ctype_dict: Dict[int, str],
+               min_prob: float = None,
+               max_pvalue: float = None) -> Iterator[Regularity]:
+    """
+    Reads rules from the file one by one, without keeping them all in memory.
+    Comment lines (starting with '#', e.g. the mark of a truncated search) are skipped
+    """
     with open(filename, 'r') as f:
-        rules = []
         for line in f:
+            if line.startswith('#') or not line.strip():
+                continue
             i, premise = read_premise(line, ctype_dict)
             i, concl = read_concl(i, line, ctype_dict)
             prob, pvalue = read_probs(i, line, len(line))
@@ -57,9 +73,7 @@ def decstr(filename: str,
             else:
                 rule.prob = prob
                 rule.pvalue = pvalue
-                rules.append(rule)
-
-        return rules
+                yield rule
 
 
 def read_premise(line, ctype_dict):
@@ -2,22 +2,41 @@ from .opers import *
 
 
 class Predicate:
-
-    def __init__(self,
-                 name: Union[int, str],
-                 vtype: Var,
-                 operation: Oper = None,
-                 opt: Union[Opers, str] = None,
-                 params: Union[int, bool, float, Any] = None) -> None:
-        self.__name = name
-        self.__vtype = vtype
-
-        if operation is not None:
-            self.__operation = operation
-        elif opt is not None and params is not None:
-            self.__operation = Oper.make(opt, params)
-        else:
-            raise ValueError("`operation` or (`opt` and `params`) must be defined")
+    """
+    Предикаты интернируются: для каждой тройки (name, vtype, operation) существует ровно один
+    экземпляр с плотным целочисленным идентификатором id. Поэтому предикаты сравниваются
+    по идентичности, а хэш -- это id
+    """
+    __slots__ = ('__name', '__vtype', '__operation', '__id', '__invert')
+
+    __registry: Dict[Tuple, 'Predicate'] = {}
+    __interned: List['Predicate'] = []
+
+    def __new__(cls,
+                name: Union[int, str],
+                vtype: Var,
+                operation: Oper = None,
+                opt: Union[Opers, str] = None,
+                params: Union[int, bool, float, Any] = None) -> 'Predicate':
+        if operation is None:
+            if opt is not None and params is not None:
+                operation = Oper.make(opt, params)
+            else:
+                raise ValueError("`operation` or (`opt` and `params`) must be defined")
+
+        key = (cls, name, vtype, operation)
+        if (pr := Predicate.__registry.get(key)) is not None:
+            return pr
+
+        pr = super().__new__(cls)
+        pr.__name = name
+        pr.__vtype = vtype
+        pr.__operation = operation
+        pr.__id = len(Predicate.__interned)
+        pr.__invert = None
+        Predicate.__registry[key] = pr
+        Predicate.__interned.append(pr)
+        return pr
 
     def __getitem__(self, x: Union[List, Iterable]) -> bool:
         """
@@ -33,23 +52,34 @@ class Predicate:
         return self.__operation(x)
 
     def __invert__(self) -> 'Predicate':
-        return Predicate(self.__name, self.__vtype, ~self.__operation)  # TODO 
+        if self.__invert is None:
+            self.__invert = Predicate(self.__name, self.__vtype, ~self.__operation)  # TODO
+        return self.__invert
 
     def __str__(self) -> str:
         return f"<#{self.__name}{str(self.__operation)}>"
 
-    def __eq__(self, other: 'Predicate') -> bool:
-        return self.__name == other.name and self.__operation == other.operation and self.__vtype == other.vtype
-        # Есть проблемы с сравнением бинарных равенств, т.е. если признак принимает только {A, B}
-        # то в нашем случае Eq(A) := x == A НЕ РАВНО Neq(B) := x != B
-        # (а по-хорошему должно было бы, т.к. это одно и то же)
+    # __eq__ не переопределяется: равные предикаты -- это один и тот же объект
+    # Есть проблемы с сравнением бинарных равенств, т.е. если признак принимает только {A, B}
+    # то в нашем случае Eq(A) := x == A НЕ РАВНО Neq(B) := x != B
+    # (а по-хорошему должно было бы, т.к. это одно и то же)
 
     def __hash__(self) -> int:
-        return hash((self.__name, self.__vtype, self.__operation))
+        return self.__id
 
     def __len__(self) -> int:
         return 1
 
+    def __reduce__(self) -> Tuple:
+        # при распаковке (в т.ч. в другом процессе) предикат интернируется заново
+        return type(self), (self.__name, self.__vtype, self.__operation)
+
+    def __copy__(self) -> 'Predicate':
+        return self
+
+    def __deepcopy__(self, memo: Dict) -> 'Predicate':
+        return self
+
     def is_positive(self) -> bool:
         if self.__vtype == Var.Bool and isinstance(self.__operation, Eq):
             return True
@@ -71,6 +101,24 @@ class Predicate:
             operation=Oper.from_dict(d['op'])
         )
 
+    @staticmethod
+    def from_id(identifier: int) -> 'Predicate':
+        """
+        Интернированный предикат по его id
+        """
+        return Predicate.__interned[identifier]
+
+    @staticmethod
+    def interned() -> int:
+        """
+        Количество интернированных предикатов, все id меньше этого числа
+        """
+        return len(Predicate.__interned)
+
+    @property
+    def id(self) -> int:
+        return self.__id
+
     @property
     def name(self) -> Union[int, str]:
         return self.__name
@@ -85,5 +133,10 @@ class Predicate:
 
 
 class UndefinedPredicate(Predicate):
-    def __init__(self) -> None:
-        super().__init__('undefined', vtype=Var.undefined, operation=UndefinedOperation())
+    __slots__ = ()
+
+    def __new__(cls) -> 'UndefinedPredicate':
+        return super().__new__(cls, 'undefined', vtype=Var.undefined, operation=UndefinedOperation())
+
+    def __reduce__(self) -> Tuple:
+        return UndefinedPredicate, ()
@@ -1,30 +1,42 @@
+from operator import attrgetter
+
 from .predicate import *
 
+_by_id = attrgetter('id')
+
 
 class Regularity:
-    __prob: float = None
-    __pvalue: float = None
+    """
+    Неизменяемое правило: посылка хранится каноническим кортежем предикатов, упорядоченных по id,
+    хэш считается один раз при создании. Изменяются только вычисленные prob и pvalue
+    """
+    __slots__ = ('__conclusion', '__premise', '__hash', '__prob', '__pvalue')
 
-    def __init__(self, conclusion: Predicate, premise: List[Predicate] = None) -> None:
-        if premise is None:
-            premise = []
+    def __init__(self, conclusion: Predicate, premise: Iterable[Predicate] = None) -> None:
         self.__conclusion = conclusion
-        self.__premise = premise
+        self.__premise = tuple(sorted(premise, key=_by_id)) if premise else ()
+        self.__hash = hash((self.__premise, conclusion))
+        self.__prob = None
+        self.__pvalue = None
 
     def __eq__(self, other: 'Regularity') -> bool:
-        # Вообще говоря, здесь могут быть проблемы, т.к. [a,b] != [b,a],
-        # поэтому нужно следить, чтобы все предикаты шли в лексикографическом порядке
-        return self.__conclusion == other.conclusion and self.__premise == other.premise
+        # посылки канонические, поэтому порядок предикатов не важен
+        return self.__hash == other.__hash and self.__conclusion is other.__conclusion and \
+            self.__premise == other.__premise
 
     def __hash__(self) -> int:
-        # Аналогичная с __eq__ ситуация
-        h = [p for p in self.__premise]
-        h.append(self.__conclusion)
-        return hash(tuple(h))
+        return self.__hash
 
     def __len__(self) -> int:
         return len(self.__premise)
 
+    def __reduce__(self) -> Tuple:
+        # id предикатов свои в каждом процессе, поэтому хэш пересчитывается при распаковке
+        return Regularity, (self.__conclusion, self.__premise), (self.__prob, self.__pvalue)
+
+    def __setstate__(self, state: Tuple[float, float]) -> None:
+        self.__prob, self.__pvalue = state
+
     def __str__(self) -> str:
         rule_str = ""
         for lit in self.__premise:
@@ -46,9 +58,7 @@ class Regularity:
         return all(map(Predicate.is_positive, self.__premise))
 
     def enhance(self, p: Predicate) -> 'Regularity':
-        new_premise = self.__premise[:]
-        new_premise.append(p)
-        return Regularity(self.__conclusion, new_premise)
+        return Regularity(self.__conclusion, self.__premise + (p,))
 
     def eval_prob(self, model) -> float:
         return self.evaluate(model)[0]
@@ -56,9 +66,19 @@ class Regularity:
     def eval_pvalue(self, model) -> float:
         return self.evaluate(model)[1]
 
-    def evaluate(self, model, force=False) -> Tuple[float, float]:
+    def evaluate(self, model, force=False, measure=None) -> Tuple[float, float]:
+        """
+        :param measure: measure to use instead of model.measure (e.g. one that knows the premise row mask)
+        """
         if self.__prob is None or self.__pvalue is None or force:
-            self.__prob, self.__pvalue = model.measure(self, model)
+            if measure is None:
+                measure = model.measure
+            if force or model.cache is None:
+                self.__prob, self.__pvalue = measure(self, model)
+            elif (measured := model.cache.get(key := self.key)) is not None:
+                self.__prob, self.__pvalue = measured
+            else:
+                self.__prob, self.__pvalue = model.cache[key] = measure(self, model)
             return self.__prob, self.__pvalue
         else:
             return self.__prob, self.__pvalue
@@ -82,13 +102,19 @@ class Regularity:
         r.prob, r.pvalue = d['prob'], d['pvalue']
         return r
 
+    @property
+    def key(self) -> 'Regularity':
+        """
+        Canonical key of the rule: the rule itself, it is compared by (premise, conclusion) with cached hash
+        """
+        return self
+
     @property
     def conclusion(self) -> Predicate:
         return self.__conclusion
 
     @property
-    def premise(self) -> List[Predicate]:
-        # тут тоже осторожно, возвращенный лист можно поменять
+    def premise(self) -> Tuple[Predicate, ...]:
         return self.__premise
 
     @property
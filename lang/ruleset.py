@@ -0,0 +1,150 @@
+import json
+
+import numpy as np
+
+from .regularity import *
+
+
+class RuleSet:
+    """
+    Поколоночное хранилище большого числа правил. Правила ссылаются на позиции предикатов
+    в локальном списке predicates, поэтому набор не зависит от id интернированных предикатов:
+
+    conclusions -- заключение каждого правила
+    offsets -- посылка i-го правила: premises[offsets[i]:offsets[i + 1]]
+    premises -- литералы посылок всех правил подряд
+    prob, pvalue -- вычисленные меры (nan, если мера не вычислена)
+    """
+    predicates: List[Predicate] = None
+
+    def __init__(self, rules: Iterable[Regularity] = None, capacity: int = 1024) -> None:
+        self.predicates = []
+        self.__index = {}  # predicate -> position in predicates
+        self.__size = 0
+        self.__premises_size = 0
+
+        capacity = max(capacity, 1)
+        self.__conclusions = np.empty(capacity, dtype=np.int32)
+        self.__offsets = np.zeros(capacity + 1, dtype=np.int64)
+        self.__premises = np.empty(2 * capacity, dtype=np.int32)
+        self.__prob = np.empty(capacity, dtype=np.float64)
+        self.__pvalue = np.empty(capacity, dtype=np.float64)
+
+        if rules is not None:
+            self.extend(rules)
+
+    def append(self, rule: Regularity) -> None:
+        if self.__size == len(self.__conclusions):
+            self.__grow_rules()
+        while self.__premises_size + len(rule) > len(self.__premises):
+            self.__premises = self.__resized(self.__premises, 2 * len(self.__premises))
+
+        i, start = self.__size, self.__premises_size
+        self.__conclusions[i] = self.__position(rule.conclusion)
+        self.__premises[start:start + len(rule)] = [self.__position(lit) for lit in rule.premise]
+        self.__prob[i] = np.nan if rule.prob is None else rule.prob
+        self.__pvalue[i] = np.nan if rule.pvalue is None else rule.pvalue
+
+        self.__size += 1
+        self.__premises_size += len(rule)
+        self.__offsets[self.__size] = self.__premises_size
+
+    def extend(self, rules: Iterable[Regularity]) -> None:
+        for rule in rules:
+            self.append(rule)
+
+    def __len__(self) -> int:
+        return self.__size
+
+    def __getitem__(self, i: int) -> Regularity:
+        """
+        Правило собирается заново из столбцов
+        """
+        if i < 0:
+            i += self.__size
+        if not (0 <= i < self.__size):
+            raise IndexError('rule index out of range')
+
+        rule = Regularity(self.predicates[self.__conclusions[i]],
+                          [self.predicates[j] for j in self.__premises[self.__offsets[i]:self.__offsets[i + 1]]])
+        if not np.isnan(prob := self.__prob[i]):
+            rule.prob = float(prob)
+        if not np.isnan(pvalue := self.__pvalue[i]):
+            rule.pvalue = float(pvalue)
+        return rule
+
+    def __iter__(self) -> Iterator[Regularity]:
+        for i in range(self.__size):
+            yield self[i]
+
+    @property
+    def conclusions(self) -> np.ndarray:
+        return self.__conclusions[:self.__size]
+
+    @property
+    def offsets(self) -> np.ndarray:
+        return self.__offsets[:self.__size + 1]
+
+    @property
+    def premises(self) -> np.ndarray:
+        return self.__premises[:self.__premises_size]
+
+    @property
+    def prob(self) -> np.ndarray:
+        return self.__prob[:self.__size]
+
+    @property
+    def pvalue(self) -> np.ndarray:
+        return self.__pvalue[:self.__size]
+
+    def save(self, file: Union[str, BinaryIO]) -> None:
+        """
+        Writes the set to file in the numpy npz format: the columns as arrays and
+        the local predicates as JSON of Predicate.to_dict (see load)
+        """
+        predicates = json.dumps([pr.to_dict() for pr in self.predicates], default=RuleSet.__json_default)
+        np.savez(file, conclusions=self.conclusions, offsets=self.offsets, premises=self.premises,
+                 prob=self.prob, pvalue=self.pvalue, predicates=np.array(predicates))
+
+    @staticmethod
+    def load(file: Union[str, BinaryIO]) -> 'RuleSet':
+        with np.load(file) as data:
+            size, premises_size = len(data['conclusions']), len(data['premises'])
+            rs = RuleSet(capacity=size)
+            rs.predicates = [Predicate.from_dict(d) for d in json.loads(str(data['predicates']))]
+            rs.__index = {pr: j for j, pr in enumerate(rs.predicates)}
+
+            capacity = len(rs.__conclusions)
+            rs.__conclusions = RuleSet.__resized(data['conclusions'], capacity)
+            rs.__offsets = RuleSet.__resized(data['offsets'], capacity + 1)
+            rs.__premises = RuleSet.__resized(data['premises'], max(premises_size, 2 * capacity))
+            rs.__prob = RuleSet.__resized(data['prob'], capacity)
+            rs.__pvalue = RuleSet.__resized(data['pvalue'], capacity)
+            rs.__size, rs.__premises_size = size, premises_size
+        return rs
+
+    @staticmethod
+    def __json_default(value: Any) -> Any:
+        # параметры операций могут быть скалярами numpy
+        if isinstance(value, np.generic):
+            return value.item()
+        raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+    def __position(self, pr: Predicate) -> int:
+        if (j := self.__index.get(pr)) is None:
+            j = self.__index[pr] = len(self.predicates)
+            self.predicates.append(pr)
+        return j
+
+    def __grow_rules(self) -> None:
+        capacity = 2 * len(self.__conclusions)
+        self.__conclusions = self.__resized(self.__conclusions, capacity)
+        self.__offsets = self.__resized(self.__offsets, capacity + 1)
+        self.__prob = self.__resized(self.__prob, capacity)
+        self.__pvalue = self.__resized(self.__pvalue, capacity)
+
+    @staticmethod
+    def __resized(a: np.ndarray, capacity: int) -> np.ndarray:
+        new_a = np.empty(capacity, dtype=a.dtype)
+        new_a[:len(a)] = a
+        return new_a
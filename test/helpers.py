@@ -0,0 +1,41 @@
+"""
+Helpers of the tests of alg: its modules import lang and utils relatively from the package root,
+so the repository is imported as package probconcepts
+"""
+import importlib.util
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if 'probconcepts' not in sys.modules:
+    __spec = importlib.util.spec_from_file_location('probconcepts', os.path.join(ROOT, '__init__.py'),
+                                                    submodule_search_locations=[ROOT])
+    sys.modules['probconcepts'] = importlib.util.module_from_spec(__spec)
+    __spec.loader.exec_module(sys.modules['probconcepts'])
+
+from probconcepts.alg.data import Sample
+
+
+def make_frame(n: int = 120, seed: int = 0) -> pd.DataFrame:
+    """
+    Categorical features a, c, d and boolean b with dependencies b ~ a, d ~ a (where c == 2)
+    and missing values of c
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, 3, n)
+    b = (a == 1) ^ (rng.random(n) < 0.1)
+    c = rng.integers(0, 4, n)
+    d = np.where(c == 2, a, rng.integers(0, 3, n))
+    df = pd.DataFrame({'a': a, 'b': b, 'c': c, 'd': d})
+    df.loc[::7, 'c'] = None
+    df['c'] = df['c'].astype('Int64')
+    return df
+
+
+def make_sample(n: int = 120, seed: int = 0) -> Sample:
+    return Sample(make_frame(n, seed), cat_features=['a', 'c', 'd'], bool_features=['b'],
+                  cd_output_path=None, encoding_output_path=None)
@@ -0,0 +1,22 @@
+import unittest
+
+import numpy as np
+
+from utils.bitset import pack, unpack, full, popcount, intersect
+
+
+class TestBitset(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(42)
+        self.a = rng.random(1001) < 0.5
+        self.b = rng.random(1001) < 0.3
+
+    def test_PackUnpack(self):
+        self.assertTrue(np.array_equal(unpack(pack(self.a), len(self.a)), self.a))
+
+    def test_Popcount(self):
+        self.assertEqual(popcount(pack(self.a)), self.a.sum())
+        self.assertEqual(popcount(full(1001)), 1001)
+
+    def test_Intersect(self):
+        self.assertEqual(popcount(intersect([pack(self.a), pack(self.b)])), (self.a & self.b).sum())
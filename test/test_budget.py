@@ -0,0 +1,121 @@
+import os
+import tempfile
+import time
+import unittest
+
+from helpers import make_sample
+
+from probconcepts.alg.budget import Budget
+from probconcepts.alg.generator import build_spcr, iter_spcr
+from probconcepts.alg.model import BaseModel
+from probconcepts.alg.sinks import ListSink
+from probconcepts.lang.parser import decstr
+
+
+class TestBudgetMeter(unittest.TestCase):
+    def test_Validation(self):
+        for kwargs in ({'seconds': 0}, {'nodes': 0}, {'rules': 0}):
+            with self.assertRaises(ValueError):
+                Budget(**kwargs)
+
+    def test_Limits(self):
+        total = Budget(nodes=5).start()
+        meter = Budget(rules=3).start(parent=total)
+
+        meter.node(4)
+        self.assertIsNone(meter.exceeded())
+        self.assertEqual(meter.take([1, 2, 3, 4]), [1, 2, 3])
+        self.assertEqual(meter.exceeded(), 'rules')
+
+        other = Budget().start(parent=total)
+        other.node()
+        self.assertEqual((total.nodes, total.rules), (5, 3))
+        self.assertEqual(other.exceeded(), 'nodes')
+
+    def test_Deadline(self):
+        meter = Budget(seconds=1e-3).start(deadline=time.time() + 60)
+        time.sleep(.01)
+        self.assertEqual(meter.exceeded(), 'seconds')
+        # общий срок раньше собственного лимита
+        self.assertEqual(Budget(seconds=60).start(deadline=time.time() - 1).exceeded(), 'seconds')
+        self.assertIsNone(Budget(seconds=60).start().exceeded())
+
+
+class TestSearchBudget(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.sample = make_sample()
+        cls.conclusions = list(cls.sample.pt)
+        cls.ctype_dict = {cls.sample.cd.features[f]: t for f, t in cls.sample.cd.type_dict.items()}
+        cls.rules = cls.by_conclusion(iter_spcr(cls.conclusions, cls.model()))
+
+    @classmethod
+    def model(cls, path: str = None, budget: Budget = None) -> BaseModel:
+        return BaseModel(cls.sample, base_depth=2, fully_depth=3, rules_write_path=path, budget=budget)
+
+    @staticmethod
+    def by_conclusion(rules):
+        found = {}
+        for rule in rules:
+            found.setdefault(rule.conclusion, []).append(rule)
+        return found
+
+    def assertTruncatedPrefixes(self, sink, stopped: bool = False):
+        """
+        Rules of every conclusion are a prefix of the full output, incomplete conclusions are marked.
+        :param stopped: the global budget was exhausted, the conclusions after the marked one are not searched
+        """
+        found = self.by_conclusion(sink.rules)
+        searched = self.conclusions
+        if stopped:
+            self.assertEqual(len(sink.truncated), 1)
+            searched = self.conclusions[:self.conclusions.index(next(iter(sink.truncated))) + 1]
+            self.assertFalse(any(conclusion in found for conclusion in self.conclusions[len(searched):]))
+
+        for conclusion in searched:
+            rules, expected = found.get(conclusion, []), self.rules.get(conclusion, [])
+            self.assertEqual(rules, expected[:len(rules)])
+            if len(rules) < len(expected):
+                self.assertIn(conclusion, sink.truncated)
+
+    def test_ConclusionLimits(self):
+        for budget, limit in ((Budget(nodes=10), 'nodes'), (Budget(rules=2), 'rules'),
+                              (Budget(seconds=1e-6), 'seconds')):
+            with self.subTest(limit=limit):
+                sink = build_spcr(self.conclusions, self.model(budget=budget), sink=ListSink())
+                self.assertTruncatedPrefixes(sink)
+                self.assertTrue(sink.truncated)
+                self.assertEqual(set(sink.truncated.values()), {limit})
+                if limit == 'rules':
+                    self.assertTrue(all(len(rules) <= 2 for rules in self.by_conclusion(sink.rules).values()))
+
+    def test_GlobalLimits(self):
+        sink = build_spcr(self.conclusions, self.model(), sink=ListSink(), budget=Budget(rules=20))
+        self.assertEqual(len(sink.rules), 20)
+        self.assertTruncatedPrefixes(sink, stopped=True)
+        self.assertEqual(list(sink.truncated.values()), ['rules'])
+
+        sink = build_spcr(self.conclusions, self.model(), sink=ListSink(), budget=Budget(nodes=100))
+        self.assertTruncatedPrefixes(sink, stopped=True)
+        self.assertEqual(list(sink.truncated.values()), ['nodes'])
+        self.assertLess(len(sink.rules), sum(map(len, self.rules.values())))
+
+        sink = build_spcr(self.conclusions, self.model(), sink=ListSink(), budget=Budget(seconds=1e-6))
+        self.assertEqual(list(sink.truncated.values()), ['seconds'])
+
+    def test_TruncatedFiles(self):
+        with tempfile.TemporaryDirectory() as path:
+            sink = build_spcr(self.conclusions, self.model(path + '/', Budget(rules=2)))
+            self.assertTrue(sink.truncated)
+            for conclusion in self.conclusions:
+                filename = os.path.join(path, f'spcr_{conclusion}.txt')
+                with open(filename) as f:
+                    lines = f.read().splitlines()
+                rules = decstr(filename, self.ctype_dict)
+
+                self.assertEqual(rules, self.rules.get(conclusion, [])[:2])
+                if conclusion in sink.truncated:
+                    self.assertEqual(lines[-1], '# truncated: rules')
+                    self.assertEqual(len(lines), len(rules) + 1)
+                else:
+                    self.assertEqual(len(lines), len(rules))
@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+
+from helpers import make_sample
+
+from probconcepts.alg.checkpoint import SearchCheckpoint
+from probconcepts.alg.generator import build_spcr
+from probconcepts.alg.model import BaseModel
+from probconcepts.alg.sinks import TextSink
+
+
+class Crash(Exception):
+    pass
+
+
+class CrashingSink(TextSink):
+    """
+    TextSink failing after `limit` written rules, as if the process was killed
+    """
+
+    def __init__(self, path: str, limit: int) -> None:
+        super().__init__(path, sync=True)
+        self.limit = limit
+        self.written = 0
+
+    def write(self, rule) -> None:
+        if self.written == self.limit:
+            raise Crash()
+        self.written += 1
+        super().write(rule)
+
+
+def read_output(path: str):
+    return {name: open(os.path.join(path, name)).read() for name in sorted(os.listdir(path))}
+
+
+class TestCheckpoint(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.sample = make_sample(300)
+        cls.conclusions = list(cls.sample.pt)
+        with tempfile.TemporaryDirectory() as path:
+            build_spcr(cls.conclusions, cls.model(path + '/'))
+            cls.expected = read_output(path)
+
+    @classmethod
+    def model(cls, path: str) -> BaseModel:
+        return BaseModel(cls.sample, base_depth=2, fully_depth=4, rules_write_path=path)
+
+    def test_Resume(self):
+        self.assertGreater(sum(map(len, self.expected.values())), 0)
+        for limit in (6, 38, 201):
+            with self.subTest(limit=limit), tempfile.TemporaryDirectory() as path:
+                checkpoint = os.path.join(path, 'search.ckpt')
+                output = os.path.join(path, 'rules') + '/'
+                os.mkdir(output)
+
+                with self.assertRaises(Crash):
+                    build_spcr(self.conclusions, self.model(output), checkpoint=checkpoint,
+                               checkpoint_interval=.01, sink=CrashingSink(output, limit))
+                self.assertTrue(os.path.exists(checkpoint))
+                build_spcr(self.conclusions, self.model(output), checkpoint=checkpoint, resume=True)
+
+                self.assertEqual(read_output(output), self.expected)
+
+    def test_OtherConclusions(self):
+        with tempfile.TemporaryDirectory() as path:
+            checkpoint = os.path.join(path, 'search.ckpt')
+            SearchCheckpoint(checkpoint, 0., path, self.conclusions).save(0)
+
+            self.assertEqual(SearchCheckpoint.load(checkpoint, 0., self.conclusions).done, 0)
+            with self.assertRaises(ValueError):
+                SearchCheckpoint.load(checkpoint, 0., self.conclusions[::-1])
@@ -0,0 +1,37 @@
+import unittest
+
+import numpy as np
+
+from utils.fisher import fisher_exact, fisher_exact_batch, fisher_exact_below, log_factorial_table
+
+
+class TestFisherExact(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        n = rng.integers(1, 500, 2000)
+        ab = (rng.random(2000) * (n + 1)).astype(int)
+        ac = (rng.random(2000) * (n + 1)).astype(int)
+        a_min, a_max = np.maximum(0, ab + ac - n), np.minimum(ab, ac)
+        self.a = a_min + (rng.random(2000) * (a_max - a_min + 1)).astype(int)
+        self.b, self.c = ab - self.a, ac - self.a
+        self.d = n - ab - ac + self.a
+
+    def test_BatchEqualsScalar(self):
+        p_batch = fisher_exact_batch(self.a, self.b, self.c, self.d, log_factorial_table(500))
+        p_scalar = [fisher_exact([[int(a), int(b)], [int(c), int(d)]])
+                    for a, b, c, d in zip(self.a, self.b, self.c, self.d)]
+
+        np.testing.assert_allclose(p_batch, p_scalar, rtol=1e-12, atol=1e-300)
+
+    def test_BatchWithoutTable(self):
+        p_batch = fisher_exact_batch([3, 0], [1, 5], [1, 5], [3, 0])
+        self.assertAlmostEqual(p_batch[0], fisher_exact([[3, 1], [1, 3]]))
+        self.assertEqual(p_batch[1], 1.)
+
+    def test_BelowMatchesBatch(self):
+        log_factorial = log_factorial_table(500)
+        p_batch = fisher_exact_batch(self.a, self.b, self.c, self.d, log_factorial)
+        for alpha in (1e-4, .05, .5):
+            below = [fisher_exact_below([[int(a), int(b)], [int(c), int(d)]], alpha, log_factorial)
+                     for a, b, c, d in zip(self.a, self.b, self.c, self.d)]
+            self.assertListEqual(below, (p_batch < alpha).tolist())
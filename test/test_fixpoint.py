@@ -0,0 +1,140 @@
+import os
+import tempfile
+import unittest
+from copy import copy, deepcopy
+from math import log
+from multiprocessing import get_start_method
+
+import numpy as np
+
+from helpers import make_frame, make_sample
+
+from probconcepts.alg.data import Sample
+from probconcepts.alg.fixpoint import consistency, fix_points
+from probconcepts.alg.generator import iter_spcr
+from probconcepts.alg.model import BaseModel
+from probconcepts.alg.ruleindex import MAX_WEIGHT, RuleIndex, rule_weight
+from probconcepts.alg.structure import Object
+
+
+# мера объекта и шаг идеализации перебором всех правил, как до индекса правил
+
+
+def loop_consistency(lits, rules, model, lit=None):
+    # lit -- только правила с заключением lit или ~lit (consistency_add)
+    measure = 0
+    for rule in rules:
+        if lit is not None and lit != rule.conclusion and ~ lit != rule.conclusion:
+            continue
+        if lits.rule_applicability(rule):
+            if rule.conclusion in lits:
+                measure += -log(1 - rule.eval_prob(model))
+            if ~ rule.conclusion in lits:
+                measure -= -log(1 - rule.eval_prob(model))
+    return measure
+
+
+def loop_step(lits, rules, model):
+    to_add = set(rule.conclusion for rule in rules if lits.rule_applicability(rule) and rule.conclusion not in lits)
+    consistency_lits = loop_consistency(lits, rules, model)
+
+    spec_delta_add, spec_lit_add = .0, None
+    for literal in to_add:
+        delta = loop_consistency(lits.add(literal), rules, model, literal) - \
+            loop_consistency(lits, rules, model, literal)
+        if delta > spec_delta_add:
+            spec_delta_add, spec_lit_add = delta, literal
+
+    delta_del, max_deleted, lit_del = .0, .0, None
+    for literal in lits:
+        deleted = loop_consistency(lits.delete(literal), rules, model)
+        delta_del = max(deleted - consistency_lits, delta_del)
+        if deleted > max_deleted:
+            max_deleted, lit_del = deleted, literal
+
+    if spec_delta_add > 0 and spec_delta_add > delta_del and \
+            consistency_lits < loop_consistency(lits.add(spec_lit_add), rules, model):
+        return lits.add(spec_lit_add)
+    if delta_del > 0 and lit_del in lits and consistency_lits < loop_consistency(lits.delete(lit_del), rules, model):
+        return lits.delete(lit_del)
+    return copy(lits)
+
+
+def loop_fix_point(lits, rules, model):
+    lits = deepcopy(lits)
+    lits.completion(model.sample.pt)
+    while (lits_next := loop_step(lits, rules, model)) != lits:
+        lits = lits_next
+    return lits
+
+
+class TestFixPoints(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.sample = make_sample()
+        cls.model = BaseModel(cls.sample, base_depth=2, fully_depth=3)
+        cls.rules = list(iter_spcr(list(cls.sample.pt), cls.model))
+        frame = make_frame()
+        cls.objects = [Object(frame.iloc[i].to_dict(), pt=cls.sample.pt, identifier=i) for i in range(20)]
+
+    def completed(self, obj: Object) -> Object:
+        obj = deepcopy(obj)
+        obj.completion(self.sample.pt)
+        return obj
+
+    def test_RuleWeight(self):
+        self.assertEqual(rule_weight(1.0), MAX_WEIGHT)
+        self.assertEqual(rule_weight(1 - 1e-20), MAX_WEIGHT)
+        self.assertAlmostEqual(rule_weight(.5), log(2))
+        index = RuleIndex(self.rules)
+        self.assertEqual(index.weights, [-log(1 - rule.prob) for rule in self.rules])
+
+    def test_Consistency(self):
+        self.assertGreater(len(self.rules), 0)
+        index = RuleIndex(self.rules, self.model)
+        for obj in self.objects:
+            obj = self.completed(obj)
+            expected = loop_consistency(obj, self.rules, self.model)
+            self.assertAlmostEqual(consistency(obj, self.rules, self.model), expected, places=9)
+            self.assertAlmostEqual(consistency(obj, index, self.model), expected, places=9)
+
+    def test_FixPoints(self):
+        expected = [loop_fix_point(obj, self.rules, self.model) for obj in self.objects]
+        self.assertNotEqual(expected, [self.completed(obj) for obj in self.objects])
+
+        objects = deepcopy(self.objects)
+        self.assertEqual(fix_points(objects, self.rules, self.model), expected)
+        # объекты вызывающего не дополняются
+        self.assertEqual(objects, self.objects)
+
+        with self.assertRaises(ValueError):
+            fix_points(objects, self.rules, self.model, n_jobs=0)
+
+    @unittest.skipUnless(get_start_method() == 'fork', 'workers import probconcepts from the parent process')
+    def test_ParallelOrder(self):
+        expected = fix_points(self.objects, self.rules, self.model)
+        objects = deepcopy(self.objects)
+        self.assertEqual(fix_points(objects, self.rules, self.model, n_jobs=2), expected)
+        self.assertEqual(objects, self.objects)
+
+        with tempfile.TemporaryDirectory() as path:
+            serial, parallel = os.path.join(path, 'serial.yml'), os.path.join(path, 'parallel.yml')
+            fix_points(objects, self.rules, self.model, write_path=serial)
+            fix_points(objects, self.rules, self.model, write_path=parallel, n_jobs=2)
+            with open(serial) as f, open(parallel) as g:
+                self.assertEqual(g.read(), f.read())
+
+    def test_ForeignFeatures(self):
+        # признак f не кодируется PredicateTable и остается в объектах вне битовых масок
+        frame = make_frame()
+        frame['f'] = np.linspace(0., 1., len(frame))
+        sample = Sample(frame, cat_features=['a', 'c', 'd'], bool_features=['b'], floating_features=['f'],
+                        cd_output_path=None, encoding_output_path=None)
+        model = BaseModel(sample, base_depth=2, fully_depth=3)
+        rules = list(iter_spcr(list(sample.pt), model))
+        objects = [Object(frame.iloc[i].to_dict(), pt=sample.pt, identifier=i) for i in range(10)]
+        self.assertTrue(all(4 in obj.extra for obj in objects))
+
+        found = fix_points(objects, rules, model)
+        self.assertEqual(found, [loop_fix_point(obj, rules, model) for obj in objects])
+        self.assertTrue(all(obj.has_feature(4) for obj in found))
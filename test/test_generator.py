@@ -0,0 +1,68 @@
+import unittest
+from multiprocessing import get_start_method
+
+from helpers import make_frame, make_sample
+
+from probconcepts.alg.budget import Budget
+from probconcepts.alg.generator import build_spcr, iter_spcr
+from probconcepts.alg.model import BaseModel
+from probconcepts.alg.sinks import ListSink
+
+
+class TestSearch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.sample = make_sample()
+        cls.conclusions = list(cls.sample.pt)
+
+    def model(self, **kwargs) -> BaseModel:
+        return BaseModel(self.sample, base_depth=2, fully_depth=3, **kwargs)
+
+    @unittest.skipUnless(get_start_method() == 'fork', 'workers import probconcepts from the parent process')
+    def test_ParallelStats(self):
+        # верхние уровни, обойденные при планировании задач, не учитываются повторно
+        serial, parallel = self.model(stats=True), self.model(stats=True)
+        rules = list(iter_spcr(self.conclusions, serial))
+
+        self.assertEqual(list(iter_spcr(self.conclusions, parallel, n_jobs=2, split_depth=1)), rules)
+        for counter in ('nodes', 'pruned', 'rules', 'checks'):
+            self.assertEqual(getattr(parallel.stats, counter), getattr(serial.stats, counter))
+        for name in ('check_proba', 'check_fisher', 'batch_measure'):
+            self.assertEqual(parallel.stats.calls[name], serial.stats.calls[name])
+        self.assertEqual(parallel.stats.conclusions.keys(), serial.stats.conclusions.keys())
+
+    def test_UnboundedBeam(self):
+        # луч, вмещающий все расширения, находит те же правила, что и полный перебор (в другом порядке)
+        rules = list(iter_spcr(self.conclusions, self.model()))
+        beam = list(iter_spcr(self.conclusions, self.model(strategy='beam', beam_width=10 ** 6)))
+
+        self.assertEqual(len(beam), len(rules))
+        self.assertEqual(set(beam), set(rules))
+
+    def test_BeamWidth(self):
+        dfs = self.model(stats=True)
+        list(iter_spcr(self.conclusions, dfs))
+        for width in (1, 3):
+            with self.subTest(width=width):
+                beam = self.model(stats=True, strategy='beam', beam_width=width)
+                list(iter_spcr(self.conclusions, beam))
+
+                # на каждом уровне глубже корня раскрывается не больше width узлов каждого заключения
+                self.assertEqual(beam.stats.nodes[0], len(self.conclusions))
+                for depth, nodes in beam.stats.nodes.items():
+                    if depth > 0:
+                        self.assertLessEqual(nodes, width * len(self.conclusions))
+                self.assertLess(sum(beam.stats.nodes.values()), sum(dfs.stats.nodes.values()))
+
+    def test_PremiseFirst(self):
+        # в выборке есть пропуски, поэтому разрешенные предикаты посылок у заключений различаются
+        self.assertTrue(make_frame()['c'].isna().any())
+        rules = list(iter_spcr(self.conclusions, self.model()))
+        self.assertGreater(len(rules), 0)
+        self.assertEqual(list(iter_spcr(self.conclusions, self.model(), premise_first=True)), rules)
+
+        # общий бюджет расходуется всеми заключениями сразу и обрывает все незаконченные
+        sink = build_spcr(self.conclusions, self.model(), sink=ListSink(), budget=Budget(nodes=30),
+                          premise_first=True)
+        self.assertEqual(set(sink.truncated.values()), {'nodes'})
+        self.assertGreater(len(sink.truncated), 1)
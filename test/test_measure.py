@@ -0,0 +1,68 @@
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+
+from lang.predicate import Predicate, Var
+from utils.bitset import pack
+from utils.fisher import log_factorial_table
+from utils.measure import MeasureCache, conclusion_mask, extend_mask, free_mask, std_batch_measure, \
+    std_shared_batch_measure
+
+
+class TestMeasureCache(unittest.TestCase):
+    def test_LRUEviction(self):
+        cache = MeasureCache(maxsize=2)
+        cache['a'] = (.5, .1)
+        cache['b'] = (.6, .2)
+        self.assertEqual(cache.get('a'), (.5, .1))
+        cache['c'] = (.7, .3)
+
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.info(), {'hits': 1, 'misses': 1, 'size': 2, 'maxsize': 2})
+
+
+class _BitSample:
+    """
+    Minimal sample for the measures: categorical features with missing values (-1) as bitsets
+    """
+
+    def __init__(self, columns):
+        self.shape = (len(columns[0]), len(columns))
+        self.log_factorial = log_factorial_table(self.shape[0])
+        self.known_matrix = pack(np.stack([c >= 0 for c in columns]), axis=1)
+        self.known = {j: self.known_matrix[j] for j in range(len(columns))}
+        self.columns = columns
+
+    def bits_of(self, pr):
+        return pack(np.array([pr(v) and v >= 0 for v in self.columns[pr.name]]))
+
+    def rows_of(self, predicates):
+        return np.stack([self.bits_of(pr) for pr in predicates])
+
+
+class TestSharedBatchMeasure(unittest.TestCase):
+    def test_SameAsBatchMeasure(self):
+        rng = np.random.default_rng(1)
+        columns = [rng.integers(-1, 3, 150) for _ in range(4)]
+        columns[1] = np.where(rng.random(150) < .7, columns[0], columns[1])
+        model = SimpleNamespace(sample=_BitSample(columns))
+
+        predicates = [Predicate(j, Var.Cat, opt=opt, params=v)
+                      for j in range(4) for v in range(3) for opt in ('=', '!=')]
+        premise = [Predicate(2, Var.Cat, opt='=', params=1)]
+        conclusions = [pr for pr in predicates if pr.name in (0, 1)]
+        candidates = [pr for pr in predicates if pr.name == 3]
+
+        mask = free_mask(model.sample)
+        for lit in premise:
+            mask = extend_mask(mask, lit, model.sample)
+        probs, p_vals = std_shared_batch_measure(mask, conclusions, candidates, model)
+
+        for i, conclusion in enumerate(conclusions):
+            rule = SimpleNamespace(conclusion=conclusion, premise=premise)
+            expected = std_batch_measure(conclusion_mask(mask, conclusion, model.sample), rule, candidates, model)
+            np.testing.assert_allclose(probs[i], expected[0])
+            np.testing.assert_allclose(p_vals[i], expected[1])
@@ -1,6 +1,8 @@
+import copy
+import pickle
 import unittest
 
-from lang.predicate import Predicate, Var
+from lang.predicate import Predicate, UndefinedPredicate, Var
 
 
 class TestPredicate(unittest.TestCase):
@@ -50,3 +52,23 @@ class TestPredicate(unittest.TestCase):
         predicate_from_dict = Predicate.from_dict(predicate_dict)
 
         self.assertEqual(predicate, predicate_from_dict)
+
+    def test_Interning(self):
+        predicate = Predicate('test', Var.Cat, opt='=', params='TestCatValue')
+        same = Predicate.from_dict(predicate.to_dict())
+
+        self.assertIs(predicate, same)
+        self.assertEqual(hash(predicate), predicate.id)
+        self.assertIs(Predicate.from_id(predicate.id), predicate)
+        self.assertIs(~~predicate, predicate)
+
+    def test_CopyPickle(self):
+        predicate = Predicate('test', Var.Float, opt='in', params=[0.1, .245])
+
+        self.assertIs(copy.copy(predicate), predicate)
+        self.assertIs(copy.deepcopy(predicate), predicate)
+        self.assertIs(pickle.loads(pickle.dumps(predicate)), predicate)
+
+        undefined = UndefinedPredicate()
+        self.assertIs(pickle.loads(pickle.dumps(undefined)), undefined)
+        self.assertIs(copy.deepcopy(undefined), undefined)
@@ -28,3 +28,8 @@ class TestRegularity(unittest.TestCase):
         reg_from_dict = Regularity.from_dict(reg_dict)
         self.assertEqual(self.reg, reg_from_dict)
 
+    def test_PremiseOrderIndependence(self):
+        reversed_reg = Regularity(self.reg.conclusion, self.reg.premise[::-1])
+        self.assertEqual(self.reg, reversed_reg)
+        self.assertEqual(hash(self.reg), hash(reversed_reg))
+        self.assertEqual(self.reg.key, reversed_reg.key)
@@ -0,0 +1,58 @@
+import io
+import pickle
+import unittest
+
+import numpy as np
+
+from lang.predicate import Predicate, Var
+from lang.regularity import Regularity
+from lang.ruleset import RuleSet
+
+
+class TestRuleSet(unittest.TestCase):
+    def setUp(self):
+        p1 = Predicate(name=1, vtype=Var.Cat, opt='!=', params=10)
+        p2 = Predicate(name=2, vtype=Var.Bool, opt='=', params=True)
+        p3 = Predicate(name=3, vtype=Var.Int, opt='<=', params=42)
+        p0 = Predicate(name=5, vtype=Var.Bool, opt='=', params=False)
+
+        self.rules = [Regularity(p0, [p1, p2, p3]), Regularity(p1), Regularity(p2, [p3, p0])]
+        self.rules[0].prob, self.rules[0].pvalue = .75, .01
+
+    def test_RoundTrip(self):
+        rs = RuleSet(self.rules, capacity=1)
+
+        self.assertEqual(len(rs), 3)
+        self.assertEqual(list(rs), self.rules)
+        self.assertEqual(rs[-1], self.rules[-1])
+        self.assertEqual((rs[0].prob, rs[0].pvalue), (.75, .01))
+        self.assertIsNone(rs[1].prob)
+        self.assertEqual(rs.offsets.tolist(), [0, 3, 3, 5])
+        self.assertTrue(np.isnan(rs.pvalue[2]))
+
+    def test_Pickle(self):
+        rs = pickle.loads(pickle.dumps(RuleSet(self.rules)))
+        self.assertEqual(list(rs), self.rules)
+
+    def test_SaveLoad(self):
+        file = io.BytesIO()
+        RuleSet(self.rules).save(file)
+        file.seek(0)
+        rs = RuleSet.load(file)
+
+        self.assertEqual(list(rs), self.rules)
+        self.assertEqual((rs[0].prob, rs[0].pvalue), (.75, .01))
+        self.assertIsNone(rs[2].prob)
+
+        rs.extend(self.rules)
+        self.assertEqual(list(rs), self.rules * 2)
+
+    def test_SaveLoadEmpty(self):
+        file = io.BytesIO()
+        RuleSet().save(file)
+        file.seek(0)
+        rs = RuleSet.load(file)
+
+        self.assertEqual(len(rs), 0)
+        rs.append(self.rules[0])
+        self.assertEqual(list(rs), self.rules[:1])
@@ -0,0 +1,92 @@
+import unittest
+from itertools import combinations
+
+from helpers import make_sample
+
+from probconcepts.alg.model import BaseModel
+from probconcepts.lang.regularity import Regularity
+from probconcepts.utils.fisher import fisher_exact
+from probconcepts.utils.measure import contingency, premise_mask, std_batch_measure, std_mask_measure, \
+    std_measure, std_pvalue_bound
+
+
+def row_loop_measure(rule, model):
+    # std_measure по строкам выборки, как до перехода на битовые маски
+    top = bottom = cons_count = all_sum = 0
+    for obj in model.sample.data:
+        d, n = 1, 1
+        val_is_unknown = False
+        for lit in rule.premise:
+            p = obj[lit.name]
+            if p is None:
+                val_is_unknown = True
+                break
+            if d != 0 and not lit(p):
+                d = 0
+        p = obj[rule.conclusion.name]
+        if val_is_unknown or p is None:
+            d, n = 0, 0
+        else:
+            all_sum += 1
+            if rule.conclusion(p):
+                cons_count += 1
+            if d == 0 or not rule.conclusion(p):
+                n = 0
+        top += n
+        bottom += d
+
+    absolute_prob = (cons_count + 1) / (model.sample.shape[0] + 2)
+    cond_prob = (top + 1) / (bottom + 2) if top != 0 and bottom != 0 else 0.
+    if absolute_prob >= cond_prob:
+        p_val = 1.
+    else:
+        p_val = fisher_exact([[top, bottom - top], [cons_count - top, all_sum - cons_count - bottom + top]])
+    return (top, bottom, cons_count, all_sum), cond_prob, p_val
+
+
+class TestSampleMeasure(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.sample = make_sample()
+        cls.model = BaseModel(cls.sample, cache_size=None)
+        cls.predicates = list(cls.sample.pt)
+
+    def rules(self, max_premise: int):
+        for conclusion in self.predicates[::3]:
+            others = [pr for pr in self.predicates if pr.name != conclusion.name]
+            for k in range(max_premise + 1):
+                for premise in combinations(others, k):
+                    if len({pr.name for pr in premise}) == k:
+                        yield Regularity(conclusion, premise)
+
+    def assertMeasure(self, measured, expected):
+        self.assertEqual(measured[0], expected[1])
+        self.assertAlmostEqual(measured[1], expected[2], places=12)
+
+    def test_Measure(self):
+        for rule in self.rules(2):
+            expected = row_loop_measure(rule, self.model)
+            mask = premise_mask(rule, self.sample)
+            self.assertEqual(contingency(rule, self.sample), expected[0])
+            self.assertMeasure(std_measure(rule, self.model), expected)
+            self.assertMeasure(std_mask_measure(mask, rule, self.model), expected)
+
+    def test_BatchMeasure(self):
+        for rule in self.rules(1):
+            used = {pr.name for pr in rule.premise} | {rule.conclusion.name}
+            candidates = [pr for pr in self.predicates if pr.name not in used]
+            probs, p_vals = std_batch_measure(premise_mask(rule, self.sample), rule, candidates, self.model)
+            for lit, prob, p_val in zip(candidates, probs, p_vals):
+                self.assertMeasure((prob, p_val), row_loop_measure(rule.enhance(lit), self.model))
+
+    def test_PValueBound(self):
+        # оценка не превосходит p-значения ни одного расширения посылки, поэтому отсечение по ней безопасно
+        for rule in self.rules(1):
+            bound = std_pvalue_bound(premise_mask(rule, self.sample), rule, self.model)
+            used = {pr.name for pr in rule.premise} | {rule.conclusion.name}
+            candidates = [pr for pr in self.predicates if pr.name not in used]
+            for k in (1, 2):
+                for extension in combinations(candidates, k):
+                    if len({pr.name for pr in extension}) == k:
+                        extended = Regularity(rule.conclusion, rule.premise + extension)
+                        self.assertLessEqual(bound, std_measure(extended, self.model)[1] + 1e-12)
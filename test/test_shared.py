@@ -0,0 +1,19 @@
+import pickle
+import unittest
+
+import numpy as np
+
+from utils.shared import SharedArrays
+
+
+class TestSharedArrays(unittest.TestCase):
+    def test_PickleAttaches(self):
+        arrays = {'bits': np.arange(13, dtype=np.uint8), 'table': np.linspace(0, 1, 600).reshape(20, 30)}
+        with SharedArrays(arrays) as shared:
+            attached = pickle.loads(pickle.dumps(shared))
+
+            for key, a in arrays.items():
+                np.testing.assert_array_equal(attached[key], a)
+                self.assertFalse(attached[key].flags.writeable)
+            self.assertLess(len(pickle.dumps(shared)), arrays['table'].nbytes + arrays['bits'].nbytes)
+            attached.unlink()
@@ -0,0 +1,108 @@
+import os
+import tempfile
+import unittest
+
+from helpers import make_sample
+
+from probconcepts.alg.generator import build_spcr, iter_spcr
+from probconcepts.alg.model import BaseModel
+from probconcepts.alg.sinks import CallbackSink, ListSink, RuleSetSink, RuleSink, RuleStoreSink
+from probconcepts.lang.parser import cstr
+from probconcepts.lang.ruleset import RuleSet
+
+
+class BatchSink(RuleSink):
+    def __init__(self, buffer_size: int) -> None:
+        super().__init__(buffer_size)
+        self.batches = []
+
+    def dump(self, rules) -> None:
+        self.batches.append(list(rules))
+
+
+class TestSinks(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.sample = make_sample()
+        cls.conclusions = list(cls.sample.pt)
+        cls.rules = list(iter_spcr(cls.conclusions, cls.model()))
+
+    @classmethod
+    def model(cls, path: str = None) -> BaseModel:
+        return BaseModel(cls.sample, base_depth=2, fully_depth=2, rules_write_path=path)
+
+    def by_conclusion(self):
+        rules = {}
+        for rule in self.rules:
+            rules.setdefault(rule.conclusion, []).append(rule)
+        return rules
+
+    def test_IterSpcr(self):
+        self.assertGreater(len(self.rules), 0)
+        self.assertTrue(all(rule.prob is not None and rule.pvalue is not None for rule in self.rules))
+
+        with tempfile.TemporaryDirectory() as path:
+            build_spcr(self.conclusions, self.model(path + '/'))
+            rules = self.by_conclusion()
+            for conclusion in self.conclusions:
+                with open(os.path.join(path, f'spcr_{conclusion}.txt')) as f:
+                    self.assertEqual(f.read(), ''.join(cstr(rule) + '\n' for rule in rules.get(conclusion, [])))
+
+    def test_ListRuleSetSinks(self):
+        self.assertEqual(build_spcr(self.conclusions, self.model(), sink=ListSink(buffer_size=4)).rules, self.rules)
+        self.assertEqual(list(build_spcr(self.conclusions, self.model(), sink=RuleSetSink()).ruleset), self.rules)
+
+    def test_CallbackSink(self):
+        batches = []
+        build_spcr(self.conclusions, self.model(),
+                   sink=CallbackSink(lambda conclusion, rules: batches.append((conclusion, list(rules))), 5))
+
+        self.assertTrue(all(0 < len(rules) <= 5 for _, rules in batches))
+        self.assertTrue(all(rule.conclusion == conclusion for conclusion, rules in batches for rule in rules))
+        self.assertEqual([rule for _, rules in batches for rule in rules], self.rules)
+
+    def test_Buffering(self):
+        sink = BatchSink(buffer_size=3)
+        rules = self.rules[:7]
+        sink.open(rules[0].conclusion)
+        for rule in rules:
+            sink.write(rule)
+        self.assertEqual(sink.batches, [rules[:3], rules[3:6]])
+
+        sink.close(truncated='nodes')
+        self.assertEqual(sink.batches, [rules[:3], rules[3:6], rules[6:]])
+        self.assertEqual(sink.truncated, {rules[0].conclusion: 'nodes'})
+
+        with self.assertRaises(ValueError):
+            BatchSink(buffer_size=0)
+        with self.assertRaises(ValueError):
+            sink.open(rules[0].conclusion, resume_from=0)
+
+    def test_RuleStoreSink(self):
+        with tempfile.TemporaryDirectory() as path:
+            build_spcr(self.conclusions, self.model(), sink=RuleStoreSink(path + '/', buffer_size=4))
+            rules = self.by_conclusion()
+            for conclusion in self.conclusions:
+                ruleset = RuleSet.load(os.path.join(path, f'spcr_{conclusion}.npz'))
+                self.assertEqual(list(ruleset), rules.get(conclusion, []))
+
+    def test_RuleStoreSinkResume(self):
+        conclusion, rules = max(self.by_conclusion().items(), key=lambda item: len(item[1]))
+        with tempfile.TemporaryDirectory() as path:
+            sink = RuleStoreSink(path + '/', buffer_size=2)
+            sink.open(conclusion)
+            for rule in rules[:3]:
+                sink.write(rule)
+            position = sink.position()
+            for rule in rules[3:5]:
+                sink.write(rule)
+            self.assertEqual(sink.position(), 5)
+
+            resumed = RuleStoreSink(path + '/')
+            resumed.open(conclusion, resume_from=position)
+            for rule in rules[3:]:
+                resumed.write(rule)
+            resumed.close()
+
+            self.assertEqual(position, 3)
+            self.assertEqual(list(RuleSet.load(os.path.join(path, f'spcr_{conclusion}.npz'))), rules)
@@ -0,0 +1,65 @@
+import json
+import pickle
+import unittest
+
+from helpers import make_sample
+
+from probconcepts.alg.generator import iter_spcr
+from probconcepts.alg.model import BaseModel
+from probconcepts.utils.stats import SearchStats
+
+
+class TestSearchStats(unittest.TestCase):
+    def test_Timed(self):
+        stats = SearchStats()
+        add = stats.timed('add', lambda a, b: a + b)
+
+        self.assertEqual(add(2, 3), 5)
+        self.assertEqual(add(1, b=1), 2)
+        self.assertEqual(stats.calls['add'], 2)
+        self.assertGreaterEqual(stats.time['add'], 0.)
+
+    def test_MergeClear(self):
+        stats, other = SearchStats(), SearchStats()
+        stats.nodes[1] += 2
+        stats.conclusions['c'] = 1.
+        other.nodes[1] += 3
+        other.checks['check_fisher'] += 1
+        other.conclusions['c'] = 0.5
+        other.cache_hits = 4
+
+        stats.merge(pickle.loads(pickle.dumps(other)))
+        self.assertEqual(stats.nodes[1], 5)
+        self.assertEqual(stats.checks['check_fisher'], 1)
+        self.assertEqual(stats.conclusions['c'], 1.5)
+        self.assertEqual(stats.cache_hits, 4)
+
+        timed = stats.timed('f', abs)
+        stats.clear()
+        timed(-1)
+        self.assertEqual(stats.calls, {'f': 1})
+        self.assertEqual(stats.nodes, {})
+        self.assertEqual(stats.cache_hits, 0)
+
+    def test_Json(self):
+        stats = SearchStats()
+        stats.nodes[0] += 1
+        stats.rules[2] += 3
+        stats.checks['accepted'] += 1
+
+        exported = json.loads(stats.to_json())
+        self.assertEqual(exported['nodes'], {'0': 1})
+        self.assertEqual(exported['rules'], {'2': 3})
+        self.assertEqual(exported['checks'], {'accepted': 1})
+
+    def test_SearchFisher(self):
+        sample = make_sample()
+        model = BaseModel(sample, base_depth=2, fully_depth=3, stats=True)
+        list(iter_spcr(list(sample.pt), model))
+
+        exported = json.loads(model.stats.to_json())
+        self.assertGreater(exported['calls']['fisher'], 0)
+        self.assertGreater(exported['time']['fisher'], 0.)
+        # тест Фишера вызывается внутри мер, его время входит в их время
+        measures = sum(exported['time'].get(name, 0.) for name in ('measure', 'mask_measure', 'batch_measure'))
+        self.assertLessEqual(exported['time']['fisher'], measures)
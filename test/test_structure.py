@@ -0,0 +1,190 @@
+import pickle
+import unittest
+from copy import copy, deepcopy
+from itertools import combinations
+
+import numpy as np
+
+from helpers import make_frame, make_sample
+
+from probconcepts.alg.data import Sample
+from probconcepts.alg.structure import Object
+from probconcepts.lang.regularity import Regularity
+
+
+class TestObject(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pt = make_sample().pt
+        frame = make_frame()
+        # в строке 0 признак c пропущен
+        cls.objects = [Object(frame.iloc[i].to_dict(), pt=cls.pt, identifier=i) for i in range(4)]
+
+    def pairs(self):
+        # один и тот же объект в битовых масках и в таблице
+        for obj in self.objects:
+            yield deepcopy(obj), Object.from_dict(obj.to_dict())
+
+    def assertSame(self, bits: Object, table: Object):
+        self.assertIs(bits.pt, self.pt)
+        self.assertIsNone(table.pt)
+        self.assertEqual(set(bits), set(table))
+        self.assertEqual(dict(bits.table), table.table)
+        self.assertEqual(len(bits), len(table))
+        self.assertEqual(bits, table)
+        # хэш объекта в масках -- по маскам, он совпадает только с хэшами объектов той же кодировки
+        self.assertEqual(hash(bits), hash(Object.from_dict(table.to_dict(), pt=self.pt)))
+
+    def test_Storage(self):
+        self.assertFalse(self.objects[0].has_feature(2))
+        for bits, table in self.pairs():
+            self.assertSame(bits, table)
+            for feature in range(4):
+                self.assertEqual(bits.has_feature(feature), table.has_feature(feature))
+            for pr in self.pt:
+                self.assertEqual(pr in bits, pr in table)
+
+    def test_AddDelete(self):
+        for bits, table in self.pairs():
+            for pr in self.pt:
+                if pr not in bits:
+                    self.assertSame(bits.add(pr), table.add(pr))
+                else:
+                    self.assertSame(bits.delete(pr), table.delete(pr))
+                    with self.assertRaises(ValueError):
+                        bits.delete(pr).delete(pr)
+            # исходные объекты не меняются
+            self.assertSame(bits, table)
+
+    def test_UpdateRemove(self):
+        for bits, table in self.pairs():
+            for pr in list(bits):
+                bits.remove(pr)
+                table.remove(pr)
+                self.assertSame(bits, table)
+                bits.update(~ pr)
+                table.update(~ pr)
+                self.assertSame(bits, table)
+
+    def test_Completion(self):
+        for bits, table in self.pairs():
+            bits.completion()
+            table.completion(self.pt)
+            self.assertIs(table.pt, self.pt)
+            self.assertEqual(bits, table)
+            self.assertGreater(len(bits), len(self.objects[bits.id]))
+
+            completed = Object.from_dict(bits.to_dict())
+            bits.decompletion()
+            completed.decompletion()
+            self.assertSame(bits, completed)
+            self.assertEqual(bits, self.objects[bits.id])
+
+        with self.assertRaises(TypeError):
+            Object.from_dict(self.objects[0].to_dict()).completion()
+
+    def test_RuleApplicability(self):
+        predicates = list(self.pt)
+        rules = [Regularity(predicates[0], premise) for k in (1, 2) for premise in combinations(predicates[1:], k)]
+        for bits, table in self.pairs():
+            bits.completion()
+            table = Object.from_dict(bits.to_dict())
+            applicable = [rule for rule in rules if bits.rule_applicability(rule)]
+            self.assertTrue(0 < len(applicable) < len(rules))
+            self.assertEqual(applicable, [rule for rule in rules if table.rule_applicability(rule)])
+
+    def test_FromDictAttach(self):
+        for bits, table in self.pairs():
+            self.assertEqual(Object.from_dict(table.to_dict(), pt=self.pt).bits, bits.bits)
+            attached = copy(table)
+            attached.attach(self.pt)
+            self.assertEqual((attached.bits, attached.known), (bits.bits, bits.known))
+            self.assertIsNotNone(table.table)
+
+    def test_ReadOnlyTable(self):
+        bits = deepcopy(self.objects[1])
+        with self.assertRaises(AttributeError):
+            bits.table[0].add(next(iter(bits)))
+        with self.assertRaises(TypeError):
+            bits.table[0] = set()
+
+        table = {feature: set(pr_set) for feature, pr_set in bits.table.items()}
+        table.pop(0)
+        bits.table = table
+        self.assertFalse(bits.has_feature(0))
+
+    def test_Pickle(self):
+        for bits, table in self.pairs():
+            for obj in (bits, table):
+                loaded = pickle.loads(pickle.dumps(obj))
+                # PredicateTable не передается, объект восстанавливается таблицей
+                self.assertIsNone(loaded.pt)
+                self.assertEqual(loaded.id, obj.id)
+                self.assertSame(bits, loaded)
+                loaded.attach(self.pt)
+                self.assertEqual((loaded.bits, loaded.known), (bits.bits, bits.known))
+
+    def test_CompletionOtherTable(self):
+        # те же предикаты в другом порядке
+        frame = make_frame().iloc[::-1].reset_index(drop=True)
+        other = Sample(frame, cat_features=['a', 'c', 'd'], bool_features=['b'],
+                       cd_output_path=None, encoding_output_path=None).pt
+        self.assertNotEqual(other.predicates, self.pt.predicates)
+        for bits, table in self.pairs():
+            bits.completion(other)
+            table.completion(self.pt)
+            self.assertIs(bits.pt, other)
+            self.assertEqual(set(bits), set(table))
+            self.assertEqual(bits.table, table.table)
+
+
+class TestForeignFeatures(unittest.TestCase):
+    # признаки f и i не кодируются PredicateTable и хранятся в Object.extra
+    @classmethod
+    def setUpClass(cls):
+        frame = make_frame()
+        frame['f'] = np.linspace(0., 1., len(frame))
+        frame['i'] = np.arange(len(frame))
+        cls.frame = frame
+        cls.pt = Sample(frame, cat_features=['a', 'c', 'd'], bool_features=['b'], floating_features=['f'],
+                        int_features=['i'], cd_output_path=None, encoding_output_path=None).pt
+
+    def test_Object(self):
+        obj = Object(self.frame.iloc[1], self.pt)
+        table = Object.from_dict(obj.to_dict())
+        self.assertEqual(set(obj.extra), {4, 5})
+        self.assertEqual(len(obj.table), 6)
+        self.assertEqual(dict(obj.table), table.table)
+        self.assertEqual(len(obj), len(table))
+        for pr in table:
+            self.assertIn(pr, obj)
+
+        f = next(iter(obj.extra[4]))
+        self.assertTrue(obj.rule_applicability(Regularity(next(iter(self.pt)), [f])))
+        self.assertNotIn(f, obj.delete(f))
+        self.assertTrue(obj.delete(f).has_feature(4))
+        self.assertEqual(obj.delete(f).add(f), obj)
+        # исходный объект не меняется
+        self.assertIn(f, obj)
+
+        obj.remove(f)
+        table.remove(f)
+        self.assertEqual(obj, table)
+        obj.update(f)
+        self.assertEqual(obj, Object(self.frame.iloc[1], self.pt))
+
+    def test_Completion(self):
+        obj = Object(self.frame.iloc[1], self.pt)
+        completed = deepcopy(obj)
+        completed.completion()
+        self.assertEqual(completed.extra, obj.extra)
+        self.assertGreater(len(completed), len(obj))
+        completed.decompletion()
+        self.assertEqual(completed, obj)
+
+    def test_Pickle(self):
+        obj = Object(self.frame.iloc[1], self.pt)
+        loaded = pickle.loads(pickle.dumps(obj))
+        self.assertEqual(loaded.table, dict(obj.table))
+        loaded.attach(self.pt)
+        self.assertEqual(loaded, obj)
@@ -1,3 +1,4 @@
 from .cluster import altair
 from .fisher import fisher_exact
+from .stats import SearchStats
 from .sys import split
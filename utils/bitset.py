@@ -0,0 +1,51 @@
+from typing import Iterable
+
+import numpy as np
+
+# number of set bits for every possible byte value
+POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def pack(mask: np.ndarray, axis: int = None) -> np.ndarray:
+    """
+    Packs boolean row mask to bitset (uint8 array, 8 rows per byte).
+    For 2d masks pass axis=1 to pack every row separately
+    """
+    return np.packbits(np.asarray(mask, dtype=bool), axis=axis)
+
+
+def unpack(bits: np.ndarray, length: int) -> np.ndarray:
+    """
+    Unpacks bitset to boolean row mask of given length
+    """
+    return np.unpackbits(bits, count=length).astype(bool)
+
+
+def full(length: int) -> np.ndarray:
+    """
+    Bitset with first `length` bits set
+    """
+    return pack(np.ones(length, dtype=bool))
+
+
+def popcount(bits: np.ndarray) -> int:
+    return int(POPCOUNT_TABLE[bits].sum())
+
+
+def popcount_rows(bits: np.ndarray) -> np.ndarray:
+    """
+    Number of set bits in every row of 2d bitset matrix
+    """
+    return POPCOUNT_TABLE[bits].sum(axis=1, dtype=np.int64)
+
+
+def intersect(bitsets: Iterable[np.ndarray], out: np.ndarray = None) -> np.ndarray:
+    """
+    AND of all bitsets. If `out` is passed, it is used as initial value and modified inplace
+    """
+    for b in bitsets:
+        if out is None:
+            out = b.copy()
+        else:
+            np.bitwise_and(out, b, out=out)
+    return out
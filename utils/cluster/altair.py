@@ -92,7 +92,7 @@ def make_ideal(settings='example_settings.yml'):
         script_n = f'{name}_{i}'
 
         with open(f"{save_path}run/{script_n}.py", 'w') as f:
-            print(___make_scripts_for_ideal(params['model'], params['data'], i, workspace), file=f)
+            print(___make_scripts_for_ideal(params['model'], params['data'], i, n_cores, workspace), file=f)
         with open(f"{save_path}run/{script_n}.sh", 'w') as f:
             print(__make_run_scripts_for_each(mem, walltime, name, python, script_n), file=f)
 
@@ -160,12 +160,13 @@ build_spcr(conclusions_to_calc, model)
     return script
 
 
-def ___make_scripts_for_ideal(md_params, data, bucket, workspace):
+def ___make_scripts_for_ideal(md_params, data, bucket, n_cores, workspace):
     script = f"""from probconcepts.alg.data import Sample, read_cd
 from probconcepts.alg.model import BaseModel
 from probconcepts.alg.fixpoint import fix_points
 from probconcepts.lang.parser import decstr
 from probconcepts.alg.structure import Object
+from probconcepts.utils import split
 import pandas as pd
 import json
 
@@ -179,65 +180,7 @@ negative_threshold = {md_params['negative_threshold']}
 model = BaseModel(sample=sample, base_depth=base_depth, fully_depth=fully_depth, confidence_level=confidence_level, negative_threshold=negative_threshold)
 
 rules = decstr('{data['rules_path']}' , {{k:v for k, v in zip(cd.features.values(), cd.type_dict.values())}})
-buckets = [range(0, 47),
- range(47, 94),
- range(94, 141),
- range(141, 188),
- range(188, 235),
- range(235, 282),
- range(282, 329),
- range(329, 376),
- range(376, 423),
- range(423, 470),
- range(470, 517),
- range(517, 564),
- range(564, 611),
- range(611, 658),
- range(658, 705),
- range(705, 752),
- range(752, 799),
- range(799, 846),
- range(846, 893),
- range(893, 940),
- range(940, 987),
- range(987, 1034),
- range(1034, 1081),
- range(1081, 1128),
- range(1128, 1175),
- range(1175, 1222),
- range(1222, 1269),
- range(1269, 1316),
- range(1316, 1363),
- range(1363, 1410),
- range(1410, 1457),
- range(1457, 1504),
- range(1504, 1551),
- range(1551, 1598),
- range(1598, 1645),
- range(1645, 1692),
- range(1692, 1739),
- range(1739, 1786),
- range(1786, 1833),
- range(1833, 1880),
- range(1880, 1927),
- range(1927, 1974),
- range(1974, 2021),
- range(2021, 2068),
- range(2068, 2115),
- range(2115, 2162),
- range(2162, 2209),
- range(2209, 2256),
- range(2256, 2303),
- range(2303, 2350),
- range(2350, 2397),
- range(2397, 2444),
- range(2444, 2491),
- range(2491, 2538),
- range(2538, 2585),
- range(2585, 2632),
- range(2632, 2679),
- range(2679, 2726),
- range(2726, 2773)]
+buckets = split(range(len(df)), {n_cores})
 lits = [Object(df.iloc[i, :], sample.pt) for i in buckets[{bucket-1}]]
 writename = '{workspace}' + 'ideal_{bucket}.json'
 fix_points(lits, rules, model, writename)
@@ -1,6 +1,8 @@
 from math import log, exp, lgamma
 from typing import List
 
+import numpy as np
+
 
 def fisher_exact(crosstab: List[List[int]], enable_assert=False) -> float:
     """
@@ -43,3 +45,121 @@ def fisher_exact(crosstab: List[List[int]], enable_assert=False) -> float:
                 break
             sr = sr_new
         return exp(-max(0., pa - p0 - log(sr)))
+
+
+def log_factorial_table(n: int) -> np.ndarray:
+    """
+    Table of log(i!) for i = 0..n
+    """
+    return np.fromiter((lgamma(i + 1) for i in range(n + 1)), dtype=float, count=n + 1)
+
+
+def fisher_exact_batch(a: np.ndarray,
+                       b: np.ndarray,
+                       c: np.ndarray,
+                       d: np.ndarray,
+                       log_factorial: np.ndarray = None,
+                       chunk: int = 32) -> np.ndarray:
+    """
+    Right tail fisher's exact test for arrays of 2x2 contingency tables [[a, b], [c, d]].
+    Same algorithm as `fisher_exact`, but the tail sums of all tables are accumulated
+    together by `chunk` terms until every sum stops changing
+    :param log_factorial: table of log(i!) at least up to max(a + b + c + d) (see log_factorial_table)
+    :param chunk: number of tail terms computed per table at once
+    :return: array of p-values
+    """
+    a, b, c, d = (np.asarray(x, dtype=np.int64) for x in (a, b, c, d))
+    ab = a + b
+    ac = a + c
+    all_sum = ab + c + d
+    bd = all_sum - ab - ac  # d - a
+    if log_factorial is None or (len(all_sum) and len(log_factorial) <= all_sum.max()):
+        log_factorial = log_factorial_table(int(all_sum.max(initial=0)))
+    lf = log_factorial
+
+    a_min = np.maximum(0, -bd)
+    a_max = np.minimum(ab, ac)
+    p0 = lf[ab] + lf[ac] + lf[all_sum - ac] + lf[all_sum - ab] - lf[all_sum]
+    pa = lf[a] + lf[b] + lf[c] + lf[d]
+
+    # левый хвост суммируется от a - 1 вниз до a_min, правый от a + 1 вверх до a_max
+    left = ab * ac > a * all_sum
+    step = np.where(left, -1, 1)
+    n_terms = np.where(left, a - a_min, a_max - a)
+    tail = (~left).astype(float)
+
+    rows = np.flatnonzero(a_min != a_max)
+    k = np.arange(1, chunk + 1)
+    start = a.copy()
+    while len(rows):
+        valid = k <= n_terms[rows, None]
+        i = np.where(valid, start[rows, None] + step[rows, None] * k, a[rows, None])
+        terms = np.exp(pa[rows, None] - lf[i] - lf[ab[rows, None] - i] - lf[ac[rows, None] - i] - lf[bd[rows, None] + i])
+        terms[~valid] = 0.
+
+        terms[:, 0] += tail[rows]
+        sums = np.cumsum(terms, axis=1)
+        unchanged = np.empty_like(valid)
+        unchanged[:, 0] = sums[:, 0] == tail[rows]
+        np.equal(sums[:, 1:], sums[:, :-1], out=unchanged[:, 1:])
+        stopped = unchanged.any(axis=1)
+        last = np.where(stopped, unchanged.argmax(axis=1) - 1, chunk - 1)
+        tail[rows] = np.where(last >= 0, sums[np.arange(len(rows)), last], tail[rows])
+
+        rows = rows[~stopped]
+        n_terms[rows] -= chunk
+        start[rows] += step[rows] * chunk
+
+    p_value = np.ones(len(a))
+    l_rows = np.flatnonzero(left & (a_min != a_max))
+    r_rows = np.flatnonzero(~left & (a_min != a_max))
+    p_value[l_rows] = 1. - np.maximum(0, np.exp(p0[l_rows] - pa[l_rows]) * tail[l_rows])
+    p_value[r_rows] = np.exp(-np.maximum(0., pa[r_rows] - p0[r_rows] - np.log(tail[r_rows])))
+    return p_value
+
+
+def fisher_exact_below(crosstab: List[List[int]],
+                       alpha: float,
+                       log_factorial: np.ndarray = None,
+                       rtol: float = 1e-9) -> bool:
+    """
+    Decides whether right tail fisher's exact p-value of 2x2 contingency table is less than `alpha`
+    without computing it exactly: the tail is summed from `a` up only until the partial sum
+    or its geometric upper bound settles the answer. If the p-value is within `rtol` of `alpha`,
+    it is computed by `fisher_exact_batch`
+    :param crosstab: 2x2 contingency table
+    :param alpha: threshold
+    :param log_factorial: table of log(i!) (see log_factorial_table)
+    :param rtol: relative tolerance of the early decision
+    :return: p-value < alpha
+    """
+    (a, b), (c, d) = crosstab
+    ab, ac, all_sum = a + b, a + c, a + b + c + d
+    a_max = min(ab, ac)
+    if max(0, ab + ac - all_sum) == a_max:
+        return 1. < alpha
+    if alpha < .49 and (a + 1) * all_sum <= ab * ac:
+        # a <= E[X] - 1 <= медианы гипергеометрического распределения, поэтому p-value >= 1/2
+        return False
+
+    lf = log_factorial if log_factorial is not None and len(log_factorial) > all_sum else \
+        log_factorial_table(all_sum)
+    p0 = lf[ab] + lf[ac] + lf[all_sum - ac] + lf[all_sum - ab] - lf[all_sum]
+    upper, lower = alpha * (1 + rtol), alpha * (1 - rtol)
+
+    tail = 0.
+    for i in range(a, a_max + 1):
+        term = exp(p0 - lf[i] - lf[ab - i] - lf[ac - i] - lf[d - a + i])
+        tail += term
+        if tail >= upper:
+            return False
+        if i == a_max:
+            if tail < lower:
+                return True
+        else:
+            # отношение соседних членов убывает, поэтому остаток хвоста не больше геометрической прогрессии
+            ratio = (ab - i) * (ac - i) / ((i + 1) * (d - a + i + 1))
+            if ratio < 1 and tail + term * ratio / (1 - ratio) < lower:
+                return True
+
+    return fisher_exact_batch([a], [b], [c], [d], lf)[0] < alpha
@@ -1,46 +1,290 @@
-from typing import NewType, Tuple
+from collections import OrderedDict
+from math import exp
+from typing import Dict, Hashable, List, NamedTuple, NewType, Optional, Tuple
 
-from .fisher import fisher_exact
+import numpy as np
+
+from .bitset import full, popcount, popcount_rows
+from .fisher import fisher_exact_batch
 
 PValue = NewType('PValue', float)
 Proba = NewType('Proba', float)
 
 
+class RowMask(NamedTuple):
+    """
+    Packed row masks of a premise:
+    known -- rows with known values of the premise and conclusion features
+    satisfied -- known rows where the premise is true
+    """
+    known: np.ndarray
+    satisfied: np.ndarray
+
+
+def root_mask(conclusion, sample) -> RowMask:
+    """
+    Row mask of the empty premise
+    """
+    known = sample.known[conclusion.name]
+    return RowMask(known, known)
+
+
+def extend_mask(mask: RowMask, lit, sample) -> RowMask:
+    """
+    Row mask of the premise enhanced by literal `lit`
+    """
+    return RowMask(mask.known & sample.known[lit.name], mask.satisfied & sample.bits_of(lit))
+
+
+def premise_mask(rule, sample) -> RowMask:
+    mask = root_mask(rule.conclusion, sample)
+    for lit in rule.premise:
+        mask = extend_mask(mask, lit, sample)
+    return mask
+
+
+def free_mask(sample) -> RowMask:
+    """
+    Row mask of the empty premise without conclusion: all rows, it is extended by extend_mask
+    and restricted to a conclusion by conclusion_mask
+    """
+    rows = full(sample.shape[0])
+    return RowMask(rows, rows)
+
+
+def conclusion_mask(mask: RowMask, conclusion, sample) -> RowMask:
+    """
+    Row mask of the premise of free_mask-based `mask` for the rule with the conclusion
+    """
+    known = sample.known[conclusion.name]
+    return RowMask(mask.known & known, mask.satisfied & known)
+
+
+def contingency(rule, sample, mask: RowMask = None) -> Tuple[int, int, int, int]:
+    """
+    Counts (top, bottom, cons_count, all_sum) of the rule on the sample bitsets.
+    Rows with unknown value of any premise or conclusion feature are skipped
+
+    top -- premise and conclusion are true
+    bottom -- premise is true
+    cons_count -- conclusion is true
+    all_sum -- number of rows taken into account
+
+    :param mask: row mask of the rule premise, if it is already known
+    """
+    if mask is None:
+        mask = premise_mask(rule, sample)
+    cons = sample.bits_of(rule.conclusion) & mask.known
+
+    return popcount(mask.satisfied & cons), popcount(mask.satisfied), popcount(cons), popcount(mask.known)
+
+
 def std_measure(rule, model) -> Tuple[Proba, PValue]:
-    top = 0
-    bottom = 0
-    cons_count = 0
-    all_sum = 0
-    for obj in model.sample.data:
-        d, n = 1, 1
-        val_is_unknown = False
-        for lit in rule.premise:
-            p = obj[lit.name]
-            if p is None:
-                val_is_unknown = True
-                break
-            if d != 0 and not lit(p):
-                d = 0
-        p = obj[rule.conclusion.name]
-        if val_is_unknown or p is None:
-            d, n = 0, 0
-        else:
-            all_sum += 1
-            if rule.conclusion(p):
-                cons_count += 1
-
-            if d == 0 or not rule.conclusion(p):
-                n = 0
-        top += n
-        bottom += d
+    return measure_counts(*contingency(rule, model.sample), model)
+
+
+def std_mask_measure(mask: RowMask, rule, model) -> Tuple[Proba, PValue]:
+    """
+    std_measure of the rule with known premise row mask
+    """
+    return measure_counts(*contingency(rule, model.sample, mask), model)
+
+
+def measure_counts(top: int, bottom: int, cons_count: int, all_sum: int, model) -> Tuple[Proba, PValue]:
+    # считается через векторную версию, чтобы p-значения одиночных и пакетных вычислений совпадали
+    probs, p_vals = measure_counts_batch(*(np.array([x]) for x in (top, bottom, cons_count, all_sum)), model)
+    return Proba(probs[0]), PValue(p_vals[0])
+
+
+def loo_contingency(rule, sample) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Contingency tables (top, bottom, cons_count, all_sum) of every premise literal against
+    the conclusion on the rows where its leave-one-out subpremise holds, for all literals at once.
+    Unlike `contingency`, missing values are not skipped: predicates are evaluated on them as on None
+
+    top -- literal and conclusion are true
+    bottom -- literal is true
+    cons_count -- conclusion is true
+    all_sum -- number of rows where the subpremise is true
+    """
+    rows = np.stack([sample.raw_bits_of(lit) for lit in rule.premise])
+    ones = full(sample.shape[0])[np.newaxis]
+
+    # others[j] = rows[0] & ... & rows[j - 1] & rows[j + 1] & ... & rows[k - 1]
+    prefix = np.concatenate([ones, np.bitwise_and.accumulate(rows, axis=0)[:-1]])
+    suffix = np.concatenate([np.bitwise_and.accumulate(rows[::-1], axis=0)[-2::-1], ones])
+    others = prefix & suffix
+
+    cons = sample.raw_bits_of(rule.conclusion)
+    satisfied = others[0] & rows[0]  # премисса целиком, одна и та же для всех литералов
+    top = np.full(len(rows), popcount(satisfied & cons))
+    bottom = np.full(len(rows), popcount(satisfied))
+
+    return top, bottom, popcount_rows(others & cons), popcount_rows(others)
+
+
+def std_batch_measure(mask: RowMask, rule, candidates: List, model) -> Tuple[List[Proba], List[PValue]]:
+    """
+    std_measure of every extension rule.enhance(lit) for lit in candidates at once:
+    the parent premise mask is intersected with the whole predicates x rows matrix
+    of the candidates and every row is popcounted
 
+    :param mask: row mask of the rule premise
+    :returns: list of probabilities and list of p-values in order of candidates
+    """
+    if len(candidates) == 0:
+        return [], []
+
+    sample = model.sample
+    cons = sample.bits_of(rule.conclusion) & mask.known
+    satisfied = sample.rows_of(candidates) & mask.satisfied
+
+    # известность значений зависит только от признака кандидата
+    features, inverse = np.unique([lit.name for lit in candidates], return_inverse=True)
+    known = sample.known_matrix[features] & mask.known
+
+    return measure_counts_batch(popcount_rows(satisfied & cons),
+                                popcount_rows(satisfied),
+                                popcount_rows(known & cons)[inverse],
+                                popcount_rows(known)[inverse],
+                                model)
+
+
+def std_shared_batch_measure(mask: RowMask, conclusions: List, candidates: List, model) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    std_measure of rules with every conclusion and the premise enhanced by every candidate at once.
+    Intersections with the premise are shared by all conclusions, so the counts of
+    conclusions x candidates rules take a single pass over the conclusions x candidates x rows bitsets
+
+    :param mask: free_mask-based row mask of the premise (without conclusion)
+    :returns: conclusions x candidates matrices of probabilities and p-values
+    """
+    if len(conclusions) == 0 or len(candidates) == 0:
+        return np.empty((len(conclusions), len(candidates))), np.empty((len(conclusions), len(candidates)))
+
+    sample = model.sample
+    cons = sample.rows_of(conclusions)  # строки заключения известны по построению
+    satisfied = sample.rows_of(candidates) & mask.satisfied
+
+    # известность значений зависит только от признаков заключения и кандидата
+    cons_features, cons_inverse = np.unique([c.name for c in conclusions], return_inverse=True)
+    cand_features, cand_inverse = np.unique([lit.name for lit in candidates], return_inverse=True)
+    cons_known = sample.known_matrix[cons_features]
+    cand_known = sample.known_matrix[cand_features] & mask.known
+
+    top = __popcount_pairs(cons, satisfied)
+    bottom = __popcount_pairs(cons_known, satisfied)[cons_inverse]
+    cons_count = __popcount_pairs(cons, cand_known)[:, cand_inverse]
+    all_sum = __popcount_pairs(cons_known, cand_known)[cons_inverse][:, cand_inverse]
+
+    probs, p_vals = measure_counts_batch(top.ravel(), bottom.ravel(), cons_count.ravel(), all_sum.ravel(), model)
+    return np.reshape(probs, top.shape), np.reshape(p_vals, top.shape)
+
+
+def __popcount_pairs(a: np.ndarray, b: np.ndarray, chunk_bytes: int = 2 ** 26) -> np.ndarray:
+    # popcount(a[i] & b[j]) для всех пар строк, по частям, чтобы ограничить размер промежуточного массива
+    counts = np.empty((len(a), len(b)), dtype=np.int64)
+    step = max(1, chunk_bytes // max(b.size, 1))
+    for i in range(0, len(a), step):
+        pairs = a[i:i + step, np.newaxis] & b[np.newaxis]
+        counts[i:i + step] = popcount_rows(pairs.reshape(-1, b.shape[1])).reshape(len(pairs), len(b))
+    return counts
+
+
+def std_pvalue_bound(mask: RowMask, rule, model) -> float:
+    """
+    Lower bound of std_measure p-values of all rules whose premise extends the rule premise.
+    An extension can only lose rows: at best its premise holds on `top` rows of the conclusion and
+    nowhere else, which gives the minimal attainable p-value C(c, top) / C(c + q, top), where
+    q bounds the number of known rows without the conclusion and c bounds the number of rows
+    with the conclusion from below
+
+    :param mask: row mask of the rule premise
+    """
+    sample = model.sample
+    cons = sample.bits_of(rule.conclusion) & mask.known
+    top = popcount(mask.satisfied & cons)
+    if top == 0:
+        return 1.
+
+    cons_count = popcount(cons)
+    q = popcount(mask.known) - cons_count
+    c_min = popcount(cons & sample.complete)  # эти строки останутся известными при любом расширении
+
+    # условная вероятность расширения не больше (top + 1) / (top + 2)
+    if c_min >= top and (c_min + 1) / (sample.shape[0] + 2) >= (top + 1) / (top + 2):
+        return 1.
+
+    c = max(c_min, top)
+    lf = sample.log_factorial
+    return exp(lf[c] - lf[c - top] - lf[c + q] + lf[c + q - top])
+
+
+def measure_counts_batch(top: np.ndarray,
+                         bottom: np.ndarray,
+                         cons_count: np.ndarray,
+                         all_sum: np.ndarray,
+                         model) -> Tuple[List[Proba], List[PValue]]:
+    """
+    Vectorized measure_counts
+    """
     absolute_prob = (cons_count + 1) / (model.sample.shape[0] + 2)  # absolute_prob д.б. < cond_prob
-    cond_prob = (top + 1) / (bottom + 2) if top != 0 and bottom != 0 else 0.
+    cond_prob = np.where((top != 0) & (bottom != 0), (top + 1) / (bottom + 2), 0.)
+
+    # если абсолютная в-ть >= условной, то p_val = 1
+    p_val = np.ones(len(top))
+    if len(i := np.flatnonzero(absolute_prob < cond_prob)):
+        a, ab, ac = top[i], bottom[i], cons_count[i]
+        # model.fisher -- fisher_exact_batch модели, при сборе статистики -- с подсчетом времени
+        fisher = getattr(model, 'fisher', None) or fisher_exact_batch
+        p_val[i] = fisher(a, ab - a, ac - a, all_sum[i] - ac - ab + a, model.sample.log_factorial)
+
+    return cond_prob.tolist(), p_val.tolist()
+
+
+class MeasureCache:
+    """
+    Bounded LRU cache of rule measures: Regularity.key -> (prob, pvalue)
+    """
+
+    def __init__(self, maxsize: int = 2 ** 17) -> None:
+        if maxsize < 1:
+            raise ValueError('maxsize must be int and >= 1')
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.__data = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Tuple[Proba, PValue]]:
+        try:
+            value = self.__data[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self.__data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def __setitem__(self, key: Hashable, value: Tuple[Proba, PValue]) -> None:
+        self.__data[key] = value
+        self.__data.move_to_end(key)
+        if len(self.__data) > self.maxsize:
+            self.__data.popitem(last=False)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.__data
+
+    def __len__(self) -> int:
+        return len(self.__data)
 
-    if absolute_prob >= cond_prob:  # Костыль -- если абсолютная в-ть >= условной, то возвращаем p_val = 1
-        return Proba(cond_prob), PValue(1.)
+    def __reduce__(self) -> Tuple:
+        # содержимое кэша в другие процессы не передается
+        return MeasureCache, (self.maxsize,)
 
-    crosstab = [[top, bottom - top], [cons_count - top, all_sum - cons_count - bottom + top]]
-    p_val = fisher_exact(crosstab)
+    def clear(self) -> None:
+        self.__data.clear()
+        self.hits = 0
+        self.misses = 0
 
-    return Proba(cond_prob) if top != 0. and bottom != 0. else 0., PValue(p_val)
+    def info(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.__data), 'maxsize': self.maxsize}
@@ -0,0 +1,64 @@
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, Tuple
+
+import numpy as np
+
+
+class SharedArrays:
+    """
+    Numpy arrays placed one after another in a single block of shared memory.
+    Only the block name and the layout are pickled, so the arrays are passed to other processes
+    without copying: unpickling attaches to the block and returns read-only views.
+    The creating process owns the block and must call unlink() (or use `with`) when workers are done
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]) -> None:
+        self.layout: Dict[str, Tuple[str, Tuple[int, ...], int]] = {}  # key -> (dtype, shape, offset)
+        size = 0
+        for key, a in arrays.items():
+            size = -(-size // 8) * 8  # смещения выровнены на 8 байт
+            self.layout[key] = (a.dtype.str, a.shape, size)
+            size += a.nbytes
+
+        self.__shm = SharedMemory(create=True, size=max(size, 1))
+        self.__owner = True
+        self.arrays = self.__views()
+        for key, a in arrays.items():
+            self.arrays[key][...] = a
+            self.arrays[key].flags.writeable = False
+
+    def __views(self) -> Dict[str, np.ndarray]:
+        return {key: np.ndarray(shape, dtype=np.dtype(dtype), buffer=self.__shm.buf, offset=offset)
+                for key, (dtype, shape, offset) in self.layout.items()}
+
+    def __getstate__(self) -> Tuple[str, Dict]:
+        return self.__shm.name, self.layout
+
+    def __setstate__(self, state: Tuple[str, Dict]) -> None:
+        name, self.layout = state
+        self.__shm = SharedMemory(name=name)
+        self.__owner = False
+        self.arrays = self.__views()
+        for a in self.arrays.values():
+            a.flags.writeable = False
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        return self.arrays[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.layout
+
+    def unlink(self) -> None:
+        """
+        Frees the block. Views obtained from this object must not be used afterwards
+        """
+        self.arrays = {}
+        self.__shm.close()
+        if self.__owner:
+            self.__shm.unlink()
+
+    def __enter__(self) -> 'SharedArrays':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.unlink()
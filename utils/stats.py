@@ -0,0 +1,101 @@
+import json
+from collections import Counter
+from time import perf_counter
+from typing import Any, Callable, Dict, Optional
+
+
+class SearchStats:
+    """
+    Counters of the rule search (build_spcr):
+
+    nodes -- search nodes expanded at every depth
+    pruned -- nodes at every depth whose subtree was cut off by the p-value bound
+    rules -- rules emitted with every length of the premise
+    depth_time -- time of search steps at every depth, seconds
+    checks -- candidate enhancements rejected by every check of build_subtree (the first failed one),
+        'accepted' -- passed all checks
+    calls, time -- number of calls and total time of timed functions (measures, check_proba, check_fisher,
+        fisher -- the Fisher exact test computing p-values of the standard measure);
+        time of nested calls is included into the outer one, e.g. of fisher into the measures. Measures are called on misses of the measure cache,
+        with n_jobs > 1 every process has its own cache, so their calls differ from the search in one process
+    conclusions -- wall time of every conclusion, seconds
+    cache_hits, cache_misses -- lookups of the measure cache
+    """
+
+    def __init__(self) -> None:
+        self.nodes = Counter()
+        self.pruned = Counter()
+        self.rules = Counter()
+        self.depth_time = Counter()
+        self.checks = Counter()
+        self.calls = Counter()
+        self.time = Counter()
+        self.conclusions: Dict[str, float] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def timed(self, name: str, func: Callable) -> 'Timed':
+        return Timed(self, name, func)
+
+    def merge(self, other: 'SearchStats') -> None:
+        """
+        Adds counters of other (e.g. collected in a worker process)
+        """
+        for counter in ('nodes', 'pruned', 'rules', 'depth_time', 'checks', 'calls', 'time'):
+            getattr(self, counter).update(getattr(other, counter))
+        for conclusion, seconds in other.conclusions.items():
+            self.conclusions[conclusion] = self.conclusions.get(conclusion, 0.) + seconds
+        self.cache_hits += other.cache_hits
+        self.cache_misses += other.cache_misses
+
+    def clear(self) -> None:
+        # счетчики очищаются на месте, т.к. на этот объект ссылаются обертки Timed
+        for counter in (self.nodes, self.pruned, self.rules, self.depth_time,
+                        self.checks, self.calls, self.time, self.conclusions):
+            counter.clear()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'nodes': dict(sorted(self.nodes.items())),
+            'pruned': dict(sorted(self.pruned.items())),
+            'rules': dict(sorted(self.rules.items())),
+            'depth_time': dict(sorted(self.depth_time.items())),
+            'checks': dict(self.checks),
+            'calls': dict(self.calls),
+            'time': dict(self.time),
+            'conclusions': self.conclusions,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+        }
+
+    def to_json(self, path: Optional[str] = None, indent: int = 2) -> str:
+        """
+        :param path: if passed, JSON is also written to this file
+        """
+        text = json.dumps(self.to_dict(), indent=indent)
+        if path is not None:
+            with open(path, 'w') as f:
+                f.write(text)
+        return text
+
+
+class Timed:
+    """
+    Wrapper of func counting its calls and time in stats under `name`
+    """
+    __slots__ = ('stats', 'name', 'func')
+
+    def __init__(self, stats: SearchStats, name: str, func: Callable) -> None:
+        self.stats = stats
+        self.name = name
+        self.func = func
+
+    def __call__(self, *args, **kwargs) -> Any:
+        start = perf_counter()
+        try:
+            return self.func(*args, **kwargs)
+        finally:
+            self.stats.time[self.name] += perf_counter() - start
+            self.stats.calls[self.name] += 1
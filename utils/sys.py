@@ -1,5 +1,5 @@
 from datetime import datetime
-from os import mkdir
+from os import cpu_count, mkdir
 from typing import Any
 
 from numpy import nan
@@ -21,6 +21,15 @@ def makedir(path: str) -> str:
     return path
 
 
+def check_n_jobs(n_jobs: int) -> int:
+    # число процессов-исполнителей, -1 -- по числу процессоров
+    if n_jobs == -1:
+        n_jobs = cpu_count()
+    if n_jobs < 1:
+        raise ValueError('n_jobs must be int and >= 1 or -1')
+    return n_jobs
+
+
 def is_none(x: Any) -> bool:
     if x is None or x is nan or x is NA:
         return True